@@ -4,10 +4,14 @@ This is the entry point for the web application. It initializes the FastHTML app
 registers routes, and starts the server.
 """
 from fasthtml.common import *
+from utils.compression import CompressionMiddleware
 from utils.database import init_db
+from utils.metrics import MetricsMiddleware
 from routes.home import register_home_routes
 from routes.procurements import register_procurement_routes
 from routes.analytics import register_analytics_routes
+from routes.metrics import register_metrics_routes
+from routes.static import register_static_routes, static_url
 
 # Initialize database
 init_db()
@@ -16,21 +20,29 @@ init_db()
 app, rt = fast_app(
     hdrs=(
         Link(rel='stylesheet', href='https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap'),
-        Link(rel='stylesheet', href='/static/styles.css'),
+        Link(rel='stylesheet', href=static_url('styles.css')),
     ),
     pico=False
 )
 
-# Serve static files
-@rt('/static/{fname:path}')
-async def static(fname: str):
-    """Serve static files from the static directory."""
-    return FileResponse(f'static/{fname}')
+# brotli/gzip for clients that accept it, see utils/compression.py
+app.add_middleware(CompressionMiddleware)
+# Latency per route and statements per request, outermost so it times
+# compression too
+app.add_middleware(MetricsMiddleware)
 
 # Register all routes
+register_static_routes(rt)
 register_home_routes(rt)
 register_procurement_routes(rt)
 register_analytics_routes(rt)
+register_metrics_routes(rt)
+
+# fast_app's catch-all for files with static extensions ('/{fname:path}.{ext:static}')
+# comes first and would shadow routes such as /procurements/export.csv
+static_exts = next(route for route in app.routes if route.path.startswith('/{fname:path}.'))
+app.routes.remove(static_exts)
+app.routes.append(static_exts)
 
 # Run the app
 if __name__ == '__main__':
@@ -0,0 +1 @@
+"""Benchmarks for the tenders-lv ingestion and web paths."""
@@ -0,0 +1,60 @@
+"""Compare per-row ingest_notice against chunked bulk upserts.
+
+Usage:
+    python -m benchmarks.bench_bulk_upsert [COUNT]
+
+Set BENCH_DB_URL to run against a scratch PostgreSQL database; otherwise
+a temporary SQLite file is used.
+"""
+import sys
+import time
+from utils.ingestion import ingest_notice, ingest_notices_bulk
+from utils.rollups import apply_deltas
+from .common import make_session_factory, synthetic_notices
+
+
+def run_row(Session, notices):
+    db = Session()
+    try:
+        added = updated = 0
+        rollup_deltas = {}
+        for notice_data in notices:
+            was_added, was_updated, _ = ingest_notice(db, notice_data, rollup_deltas)
+            added += was_added
+            updated += was_updated
+        apply_deltas(db, rollup_deltas)
+        db.commit()
+        return added, updated
+    finally:
+        db.close()
+
+
+def run_bulk(Session, notices):
+    db = Session()
+    try:
+        _, added, updated, _ = ingest_notices_bulk(db, notices)
+        db.commit()
+        return added, updated
+    finally:
+        db.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    # Second batch overlaps the first by half, like consecutive re-syncs
+    first = synthetic_notices(count, seed=1)
+    second = synthetic_notices(count // 2, seed=2) + synthetic_notices(count // 2, seed=3, prefix='BENCH2')
+    
+    print(f"{'mode':<6} {'batch':<8} {'seconds':>8} {'notices/s':>10} {'added':>7} {'updated':>8}")
+    for name, runner in (('row', run_row), ('bulk', run_bulk)):
+        Session, engine = make_session_factory()
+        for label, notices in (('fresh', first), ('overlap', second)):
+            start = time.perf_counter()
+            added, updated = runner(Session, notices)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<6} {label:<8} {elapsed:>8.2f} {len(notices) / elapsed:>10.0f} {added:>7} {updated:>8}")
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
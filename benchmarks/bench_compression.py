@@ -0,0 +1,88 @@
+"""Measure response compression per route: bytes on the wire and CPU time.
+
+Usage:
+    BENCH_DB_URL=postgresql://... python -m benchmarks.bench_compression [--notices N] [--requests N]
+
+Seeds a scratch PostgreSQL database like check_query_plans (the tables are
+dropped) and requests every route with each content coding. Reports the
+bytes sent, the CPU time of an uncompressed request, and the CPU time added
+by compressing it, without and with the compressed body cache.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+# Route paths measured ({identifier} is a seeded notice)
+ROUTES = [
+    '/',
+    '/procurements',
+    '/procurements?search=Ventspils+pašvaldība&sort=relevance',
+    '/notice/{identifier}',
+    '/analytics',
+    '/analytics/chart/value',
+    '/analytics/plotly-template.json',
+    '/static/styles.css',
+]
+
+CODINGS = ('identity', 'gzip', 'br')
+
+
+def cpu_per_request(client, url, coding, requests, before_each=None):
+    """Return (CPU milliseconds per request, bytes on the wire) for a route."""
+    response = client.get(url, headers={'Accept-Encoding': coding})
+    response.raise_for_status()
+    wire = int(response.headers.get('content-length', len(response.content)))
+    started = time.process_time()
+    for _ in range(requests):
+        if before_each:
+            before_each()
+        client.get(url, headers={'Accept-Encoding': coding})
+    return (time.process_time() - started) * 1000 / requests, wire
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure response compression per route')
+    parser.add_argument('--notices', type=int, default=20000, help='Notices to seed (default: 20000)')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per measurement (default: 50)')
+    args = parser.parse_args()
+
+    db_url = os.getenv('BENCH_DB_URL')
+    if not db_url or not db_url.startswith('postgresql'):
+        sys.exit("Set BENCH_DB_URL to a scratch PostgreSQL database")
+
+    # The app reads DB_URL and RESPONSE_CACHE_PATH at import time
+    os.environ['DB_URL'] = db_url
+    os.environ['RESPONSE_CACHE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='tenders-bench-'), 'responses.sqlite3')
+    from starlette.testclient import TestClient
+    from utils.compression import compressed_bodies, supported_encodings
+    from utils.database import SessionLocal, ProcurementNotice, engine
+    from .check_query_plans import seed
+    from .common import reset_database
+    reset_database(engine)
+    seed(engine, SessionLocal, args.notices)
+    db = SessionLocal()
+    identifier = db.query(ProcurementNotice.identifier).order_by(ProcurementNotice.created_at.desc()).limit(1).scalar()
+    db.close()
+
+    import app
+    codings = [coding for coding in CODINGS if coding == 'identity' or coding in supported_encodings()]
+    print(f"{'route':<58} {'coding':<8} {'bytes':>8} {'ratio':>6} {'cpu ms':>7} {'+cold':>7} {'+cached':>7}")
+    with TestClient(app.app) as client:
+        for route in ROUTES:
+            url = route.format(identifier=quote(identifier))
+            base_cpu, base_wire = cpu_per_request(client, url, 'identity', args.requests)
+            for coding in codings:
+                if coding == 'identity':
+                    print(f"{url:<58} {coding:<8} {base_wire:>8} {1:>6.2f} {base_cpu:>7.2f}")
+                    continue
+                cold_cpu, wire = cpu_per_request(client, url, coding, args.requests, compressed_bodies.clear)
+                cached_cpu, _ = cpu_per_request(client, url, coding, args.requests)
+                print(f"{url:<58} {coding:<8} {wire:>8} {wire / base_wire:>6.2f} {cold_cpu:>7.2f} "
+                      f"{cold_cpu - base_cpu:>+7.2f} {cached_cpu - base_cpu:>+7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""End-to-end ingestion benchmark suite.
+
+Usage:
+    python -m benchmarks.bench_ingest [--notices N] [--save FILE] [--compare FILE]
+
+Every scenario runs in a fresh subprocess against a local stub of
+open.iub.gov.lv serving a synthetic daily file, and a scratch database
+(BENCH_DB_URL, or a temporary SQLite file). Reported per scenario:
+notices/s, database statements per notice and peak RSS.
+
+--save writes the results as JSON; --compare exits non-zero when a scenario
+got slower, issues more queries per notice or uses more memory than the
+saved baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DAY = datetime(2025, 11, 3)
+
+SCENARIOS = [
+    'fetch',
+    'fetch[cached-304]',
+    'ingest_notice',
+    'sync_date[row]',
+    'sync_date[bulk]',
+    'sync_date[bulk-resync]',
+    'sync_date[stream]',
+    'sync_date[pipeline]',
+]
+
+
+def run_scenario(name, root):
+    """Run one scenario in this process and return its measurements."""
+    from utils import ingestion
+    from utils.rollups import apply_deltas
+    from .common import count_queries, make_session_factory, stub_iub_server
+    
+    date_str = ingestion.notice_date_str(DAY)
+    queries = None
+    
+    with stub_iub_server(root):
+        if name.startswith('fetch'):
+            if name == 'fetch[cached-304]':
+                ingestion.fetch_procurement_data(date_str)  # Warm the cache
+            start = time.perf_counter()
+            processed = len(ingestion.fetch_procurement_data(date_str))
+            elapsed = time.perf_counter() - start
+        else:
+            Session, engine = make_session_factory()
+            ingestion.SessionLocal = Session
+            
+            if name == 'ingest_notice':
+                notices = ingestion.fetch_procurement_data(date_str)
+                db = Session()
+                with count_queries(engine) as counter:
+                    start = time.perf_counter()
+                    rollup_deltas = {}
+                    for notice_data in notices:
+                        ingestion.ingest_notice(db, notice_data, rollup_deltas)
+                    apply_deltas(db, rollup_deltas)
+                    db.commit()
+                    elapsed = time.perf_counter() - start
+                db.close()
+                processed = len(notices)
+            else:
+                mode = name[len('sync_date['):-1]
+                kwargs = {}
+                if mode == 'bulk-resync':
+                    mode = 'bulk'
+                    ingestion.sync_date(DAY, mode=mode)
+                if mode == 'pipeline':
+                    from concurrent.futures import ProcessPoolExecutor
+                    kwargs['normalize_pool'] = ProcessPoolExecutor(max_workers=2)
+                with count_queries(engine) as counter:
+                    start = time.perf_counter()
+                    result = ingestion.sync_date(DAY, mode=mode, **kwargs)
+                    elapsed = time.perf_counter() - start
+                if result['status'] != 'success':
+                    raise RuntimeError(f"{name} failed: {result.get('error')}")
+                processed = result['processed']
+            queries = counter['count']
+    
+    return {
+        'seconds': elapsed,
+        'notices': processed,
+        'notices_per_second': processed / elapsed,
+        'queries_per_notice': queries / processed if queries is not None else None,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_isolated(name, root):
+    """Run a scenario in a subprocess so peak RSS is per scenario."""
+    env = dict(os.environ)
+    env['IUB_CACHE_DIR'] = tempfile.mkdtemp(prefix='tenders-cache-') if '304' in name else ''
+    # Measure ingestion only, not the analytics pre-warming after a sync
+    env['RESPONSE_CACHE_PATH'] = ''
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_ingest', '--child', name, root],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Return regressions of results against a saved baseline."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or previous['notices'] != current['notices']:
+            continue
+        if current['notices_per_second'] < previous['notices_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {previous['notices_per_second']:.0f} -> {current['notices_per_second']:.0f} notices/s")
+        if (current['queries_per_notice'] or 0) > (previous['queries_per_notice'] or 0) * (1 + tolerance) + 1e-9:
+            regressions.append(f"{name}: {previous['queries_per_notice']:.3f} -> {current['queries_per_notice']:.3f} queries/notice")
+        if current['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: {previous['peak_rss_mb']:.0f} -> {current['peak_rss_mb']:.0f} MB peak RSS")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingestion benchmark suite')
+    parser.add_argument('--notices', type=int, default=5000, help='Notices in the synthetic daily file')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Run only these scenarios')
+    parser.add_argument('--save', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative regression (default: 0.25)')
+    args = parser.parse_args()
+    
+    from .common import synthetic_notices, write_daily_file
+    root = tempfile.mkdtemp(prefix='tenders-stub-')
+    write_daily_file(root, DAY, synthetic_notices(args.notices, day=DAY))
+    
+    database = 'PostgreSQL' if os.getenv('BENCH_DB_URL') else 'SQLite'
+    print(f"{args.notices} synthetic notices, {database} database")
+    print(f"{'scenario':<24} {'seconds':>8} {'notices/s':>10} {'queries/notice':>15} {'peak RSS MB':>12}")
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        stats = results[name] = run_isolated(name, root)
+        queries = f"{stats['queries_per_notice']:.3f}" if stats['queries_per_notice'] is not None else '-'
+        print(f"{name:<24} {stats['seconds']:>8.2f} {stats['notices_per_second']:>10.0f} {queries:>15} {stats['peak_rss_mb']:>12.0f}")
+    
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        print(json.dumps(run_scenario(sys.argv[2], sys.argv[3])))
+    else:
+        main()
@@ -0,0 +1,69 @@
+"""Peak memory of a whole-file sync vs a streamed sync of one large day.
+
+Usage:
+    python -m benchmarks.bench_stream_memory [COUNT]
+
+Each mode runs in a fresh subprocess against a local stub of the open data
+API so peak RSS figures are not polluted by the other run.
+"""
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+DAY = datetime(2025, 11, 3)
+
+
+def child(mode, root):
+    from utils import ingestion
+    from .common import make_session_factory, stub_iub_server
+    
+    Session, _ = make_session_factory()
+    ingestion.SessionLocal = Session
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with stub_iub_server(root):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = ingestion.sync_date(DAY, mode=mode)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        'status': result['status'],
+        'processed': result.get('processed', 0),
+        'seconds': elapsed,
+        'peak_traced_mb': peak / 2**20,
+        'rss_growth_mb': (rss_after - rss_before) / 1024,
+    }))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    from .common import synthetic_notices, write_daily_file
+    
+    root = tempfile.mkdtemp(prefix='tenders-stub-')
+    path = write_daily_file(root, DAY, synthetic_notices(count))
+    with open(path, 'rb') as f:
+        size_mb = len(f.read()) / 2**20
+    print(f"Daily file: {count} notices, {size_mb:.1f} MB")
+    
+    print(f"{'mode':<7} {'seconds':>8} {'peak traced MB':>15} {'RSS growth MB':>14}")
+    for mode in ('bulk', 'stream'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_stream_memory', '--child', mode, root],
+            check=True, capture_output=True, text=True
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<7} {stats['seconds']:>8.2f} {stats['peak_traced_mb']:>15.1f} {stats['rss_growth_mb']:>14.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
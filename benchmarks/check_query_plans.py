@@ -0,0 +1,210 @@
+"""Check that the web routes' queries use indexes.
+
+Usage:
+    BENCH_DB_URL=postgresql://... python -m benchmarks.check_query_plans [--notices N]
+
+Seeds a scratch PostgreSQL database (the tables are dropped) with synthetic
+notices spread over two years, requests every route through the app, and
+runs EXPLAIN on each SELECT the routes issue. Exits non-zero if any of them
+reads tenders_lv.procurement_notices (or one of its monthly partitions)
+with a sequential scan, or if a query of a SINGLE_PARTITION_ROUTES route
+reads more than one partition.
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+# Route paths requested, covering every query the pages issue
+ROUTES = [
+    '/',
+    '/procurements',
+    '/procurements?after={cursor}',
+    '/procurements?before={cursor}',
+    '/procurements?notice_type=mk-contract&after={cursor}',
+    '/procurements?notice_type=mk-contract',
+    '/procurements?sort=value',
+    '/procurements?sort=value&page=3',
+    '/procurements?search=45233140',
+    '/procurements?search=Ventspils+pašvaldība&sort=relevance',
+    '/procurement/{id}',
+    '/notice/{identifier}',
+    '/analytics',
+    '/procurements/export.csv?since={since}',
+    '/procurements/export.jsonl?notice_type=mk-contract&since={since}',
+]
+
+# Routes whose queries must be pruned to a single monthly partition
+SINGLE_PARTITION_ROUTES = {'/notice/{identifier}'}
+
+
+def seed(engine, Session, count):
+    """Fill the scratch database and refresh planner statistics."""
+    from sqlalchemy import text
+    from utils.database import NoticeIdentifier, ProcurementNotice
+    from utils.ingestion import normalize_notice
+    from utils.organizations import resolve_organizations
+    from utils.partitions import ensure_notice_partitions
+    from utils.rollups import rebuild_rollups
+    from .common import synthetic_notices
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    db = Session()
+    rows = []
+
+    def insert(rows):
+        ensure_notice_partitions(engine, *(row['created_at'] for row in rows))
+        resolve_organizations(db, rows)
+        db.bulk_insert_mappings(NoticeIdentifier, [
+            {'identifier': row['identifier'], 'created_at': row['created_at']} for row in rows
+        ])
+        db.bulk_insert_mappings(ProcurementNotice, rows)
+
+    for notice in synthetic_notices(count):
+        row = normalize_notice(notice)
+        created = now - timedelta(days=rng.uniform(0, 730))
+        row['created_at'] = row['updated_at'] = created
+        if row['deadline_receipt_tenders_date']:
+            row['deadline_receipt_tenders_date'] = created + timedelta(days=rng.randint(7, 60))
+        rows.append(row)
+        if len(rows) == 5000:
+            insert(rows)
+            rows = []
+    if rows:
+        insert(rows)
+    rebuild_rollups(db)
+    db.commit()
+    db.close()
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text("VACUUM ANALYZE tenders_lv.procurement_notices"))
+        conn.execute(text("VACUUM ANALYZE tenders_lv.notice_rollup"))
+
+
+def capture_route_queries(engine):
+    """Request every route and return (route, statement, parameters) of the SELECTs they executed."""
+    from sqlalchemy import event, func
+    from starlette.testclient import TestClient
+    from utils.database import ProcurementNotice, get_async_engine
+    from utils.pagination import encode_cursor
+
+    statements = []
+    route = None
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((route, statement, parameters))
+
+    import app
+    from utils.database import SessionLocal
+    db = SessionLocal()
+    notice = db.query(ProcurementNotice).order_by(ProcurementNotice.created_at.desc()).offset(5000).first()
+    # Incremental exports pull about a day of changes
+    since = db.query(func.max(ProcurementNotice.updated_at)).scalar() - timedelta(days=1)
+    db.close()
+
+    # The routes query through the async engine, the CLI through the sync one
+    engines = (engine, get_async_engine().sync_engine)
+    for listened in engines:
+        event.listen(listened, 'before_cursor_execute', before_cursor_execute)
+    try:
+        # One event loop for all requests, as pooled async connections need
+        with TestClient(app.app) as client:
+            for route in ROUTES:
+                response = client.get(route.format(
+                    id=notice.id, identifier=quote(notice.identifier), cursor=encode_cursor(notice),
+                    since=since.isoformat()
+                ))
+                response.raise_for_status()
+    finally:
+        for listened in engines:
+            event.remove(listened, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def explain(cursor, statement, parameters):
+    """Return the plan of a captured SELECT, run through a psycopg2 cursor."""
+    if isinstance(parameters, dict):
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+        return cursor.fetchone()[0][0]['Plan']
+    # asyncpg statements use $1 placeholders, which only prepared statements take
+    cursor.execute('PREPARE plan_check AS ' + statement)
+    try:
+        placeholders = ', '.join(['%s'] * len(parameters))
+        cursor.execute(f'EXPLAIN (FORMAT JSON) EXECUTE plan_check ({placeholders})' if parameters
+                       else 'EXPLAIN (FORMAT JSON) EXECUTE plan_check', tuple(parameters))
+        return cursor.fetchone()[0][0]['Plan']
+    finally:
+        cursor.execute('DEALLOCATE plan_check')
+
+
+def seq_scans(plan):
+    """Yield relation names read by sequential scans anywhere in a plan."""
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan.get('Relation Name')
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def partitions_read(plan):
+    """Return the procurement_notices relations a plan reads."""
+    names = set()
+    if (plan.get('Relation Name') or '').startswith('procurement_notices'):
+        names.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        names |= partitions_read(child)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check route queries for sequential scans')
+    parser.add_argument('--notices', type=int, default=100000, help='Notices to seed (default: 100000)')
+    args = parser.parse_args()
+
+    db_url = os.getenv('BENCH_DB_URL')
+    if not db_url or not db_url.startswith('postgresql'):
+        sys.exit("Set BENCH_DB_URL to a scratch PostgreSQL database")
+
+    # The app reads DB_URL at import time
+    os.environ['DB_URL'] = db_url
+    from utils.database import SessionLocal, engine
+    from .common import reset_database
+    reset_database(engine)
+    seed(engine, SessionLocal, args.notices)
+
+    failures = 0
+    checked = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        # Empty partitions (next month's) are always seq scanned, harmlessly
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relnamespace = 'tenders_lv'::regnamespace AND relpages = 0"
+        )
+        empty = {name for name, in cursor.fetchall()}
+        for route, statement, parameters in capture_route_queries(engine):
+            if 'procurement_notices' not in statement:
+                continue
+            checked += 1
+            plan = explain(cursor, statement, parameters)
+            if route in SINGLE_PARTITION_ROUTES and len(partitions_read(plan)) > 1:
+                failures += 1
+                print(f"{len(partitions_read(plan))} PARTITIONS: {' '.join(statement.split())}")
+            if not any(
+                name.startswith('procurement_notices') and name not in empty for name in seq_scans(plan)
+            ):
+                continue
+            failures += 1
+            print(f"SEQ SCAN: {' '.join(statement.split())}")
+    finally:
+        raw.close()
+
+    print(f"{checked} queries checked, {failures} sequential scan(s) or unpruned partition read(s) on procurement_notices")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Shared helpers for benchmarks: scratch databases, synthetic notices and a stub API."""
+import functools
+import json
+import os
+import random
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from utils import ingestion
+from utils.database import Base
+from utils.ingestion import notice_date_str
+from utils.migrations import run_migrations
+
+NOTICE_TYPES = ['pil-planned-contract', 'mk-contract', 'sps-discussion', 'mk-contract-award', 'pil-contract-change']
+NOTICE_TYPE_WEIGHTS = [40, 30, 10, 15, 5]
+PROCEDURE_TYPES = ['open', 'restricted', 'negotiated', 'competitive-dialogue', 'small-procurement']
+NATURE_TYPES = ['works', 'supplies', 'services']
+CPV_CODES = [
+    '03100000-2', '09130000-9', '15800000-6', '18100000-0', '22100000-1', '30200000-1',
+    '31500000-1', '33100000-1', '33600000-6', '34100000-8', '39100000-3', '44100000-1',
+    '45000000-7', '45200000-9', '45233140-2', '48000000-8', '50100000-6', '55300000-3',
+    '60100000-9', '71200000-0', '72000000-5', '79000000-4', '80500000-9', '85100000-0',
+    '90500000-2', '90910000-9', '98300000-6',
+]
+CITIES = ['Rīga', 'Daugavpils', 'Liepāja', 'Jelgava', 'Jūrmala', 'Ventspils', 'Rēzekne', 'Valmiera', 'Ogre', 'Cēsis']
+ORG_KINDS = ['pašvaldība', 'novada dome', 'valsts aģentūra', 'slimnīca', 'SIA', 'vidusskola', 'ministrija']
+WORDS = [
+    'remonts', 'piegāde', 'tehniskā', 'apkope', 'būvniecība', 'pakalpojumi', 'ēkas', 'ceļu',
+    'pārbūve', 'iekārtu', 'medicīnas', 'programmatūras', 'izstrāde', 'uzturēšana', 'transporta',
+    'līdzekļu', 'telpu', 'uzkopšana', 'projektēšana', 'autoruzraudzība', 'energoefektivitātes',
+]
+
+
+def _organizations(rng, count=400):
+    """Stable buyer pool, so organizations repeat across notices like in the feed."""
+    return [
+        (f'{rng.choice(CITIES)} {rng.choice(ORG_KINDS)} {i}', rng.choice(CITIES), f'9000{rng.randint(1000000, 9999999)}')
+        for i in range(count)
+    ]
+
+
+def make_session_factory(db_url=None):
+    """Create a session factory for a scratch benchmark database.
+    
+    Uses BENCH_DB_URL (or db_url) when given, otherwise a temporary SQLite
+    file. SQLite has no schemas, so tenders_lv is mapped to the default one.
+    
+    Returns:
+        tuple: (sessionmaker, engine)
+    """
+    db_url = db_url or os.getenv('BENCH_DB_URL')
+    if db_url:
+        engine = create_engine(db_url)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix='tenders-bench-'), 'bench.db')
+        engine = create_engine(
+            f'sqlite:///{path}',
+            execution_options={'schema_translate_map': {'tenders_lv': None}}
+        )
+    reset_database(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine), engine
+
+
+def reset_database(engine):
+    """Drop and recreate all tables, then apply the migrations again."""
+    Base.metadata.drop_all(bind=engine)
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS tenders_lv.schema_migrations"))
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+
+def synthetic_notices(count, seed=0, prefix='BENCH', day=None):
+    """Generate realistic IUB-shaped notice dictionaries.
+    
+    Mirrors the open data feed: Latvian text with diacritics, a skewed mix of
+    notice types, buyers that repeat across notices, long descriptions, and
+    optional fields (value, dates, contacts, URLs) that are sometimes missing,
+    empty or non-numeric.
+    
+    Args:
+        count: Number of notices to generate
+        seed: Random seed so runs are repeatable
+        prefix: Identifier prefix, vary it to control overlap between batches
+        day: Publication date the notices are relative to
+    """
+    rng = random.Random(seed)
+    organizations = _organizations(random.Random(0))
+    base = day or datetime(2025, 11, 1)
+    notices = []
+    for i in range(count):
+        org_name, org_city, org_id = rng.choice(organizations)
+        opening = base + timedelta(days=rng.randint(7, 60), hours=rng.randint(8, 16), minutes=rng.choice([0, 30]))
+        value_roll = rng.random()
+        if value_roll < 0.15:
+            estimated_value = None
+        elif value_roll < 0.2:
+            estimated_value = rng.choice(['', 'nav norādīts'])
+        else:
+            estimated_value = round(rng.lognormvariate(10, 1.8), 2)
+        notice = {
+            'identifier': f'{prefix}-{i:07d}',
+            'name': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))).capitalize(),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 400))),
+            'noticeType': rng.choices(NOTICE_TYPES, NOTICE_TYPE_WEIGHTS)[0],
+            'procedureType': rng.choice(PROCEDURE_TYPES),
+            'mainNatureType': rng.choice(NATURE_TYPES),
+            'cpvType': rng.choice(CPV_CODES) if rng.random() > 0.05 else None,
+            'currency': 'EUR',
+            'organizationName': org_name,
+            'organizationCity': org_city,
+            'organizationIdentifier': org_id,
+            'contactName': rng.choice(['Jānis Bērziņš', 'Anna Kalniņa', 'Līga Ozola', None]),
+            'contactEmail': rng.choice(['iepirkumi@example.lv', 'info@example.gov.lv', None]),
+            'contactTelephone': rng.choice(['+37167000000', '+37126000000', None]),
+            'publicOpeningDate': opening.isoformat() + 'Z' if rng.random() > 0.1 else None,
+            'deadlineReceiptTendersDate': opening.isoformat() + 'Z' if rng.random() > 0.05 else None,
+            'documentsURL': f'https://www.eis.gov.lv/EKEIS/Supplier/Procurement/{i}' if rng.random() > 0.2 else None,
+            'submissionURL': 'https://www.eis.gov.lv' if rng.random() > 0.3 else None,
+        }
+        if estimated_value is not None:
+            notice['estimatedValue'] = estimated_value
+        notices.append(notice)
+    return notices
+
+
+def write_daily_file(root, day, notices):
+    """Write notices where the open data API would publish them for a day.
+    
+    Returns:
+        str: Path of the written file
+    """
+    path = os.path.join(root, notice_date_str(day) + '.json')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(notices, f, ensure_ascii=False)
+    return path
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def count_queries(engine):
+    """Count statements executed on an engine inside the block.
+    
+    Yields:
+        dict: {'count': int}, updated as statements run
+    """
+    counter = {'count': 0}
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+    
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextmanager
+def stub_iub_server(root):
+    """Serve a directory of daily files as a local stand-in for open.iub.gov.lv.
+    
+    Points utils.ingestion at the stub for the duration of the block.
+    
+    Yields:
+        str: Base URL of the stub server
+    """
+    handler = functools.partial(_QuietHandler, directory=root)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    previous = ingestion.IUB_BASE_URL
+    ingestion.IUB_BASE_URL = base_url
+    try:
+        yield base_url
+    finally:
+        ingestion.IUB_BASE_URL = previous
+        server.shutdown()
+        server.server_close()
@@ -35,3 +35,15 @@ def get_footer():
             cls="container"
         )
     )
+
+
+def with_cache_headers(page, headers):
+    """Attach cache headers (see utils/http_cache.py) to a page's components."""
+    if not isinstance(page, tuple):
+        page = (page,)
+    return (*page, *(HttpHeader(name, value) for name, value in headers.items()))
+
+
+def not_modified(headers):
+    """Return an empty 304 response carrying a page's cache headers."""
+    return Response(status_code=304, headers={**headers, 'Vary': 'HX-Request, HX-History-Restore-Request'})
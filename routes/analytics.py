@@ -1,29 +1,74 @@
-"""Analytics dashboard route with Plotly visualizations."""
+"""Analytics dashboard route with Plotly visualizations.
+
+Charts are sent as JSON figure specs and drawn in the browser by
+static/charts.js with plotly.js. The layout template, which is most of a
+serialized figure, is served once from /analytics/plotly-template.json
+instead of being repeated in every chart. plotly is only imported when a
+figure is built, so cached pages and worker start-up never load it.
+
+Each chart is also served on its own from /analytics/chart/{name}. The
+dashboard embeds the charts that are cached and leaves placeholders that
+fetch the others in parallel, so the summary cards are sent right away.
+Fragments are built with the sync query code (shared with the CLI's cache
+warm-up) run on the async session, and only a few builds run at once, so
+uncached analytics cannot take every pooled connection from the list and
+detail pages.
+"""
+import asyncio
+from functools import lru_cache
 from fasthtml.common import *
-from sqlalchemy import func, desc, cast, Numeric
-from utils.database import SessionLocal, ProcurementNotice
-from . import get_header, get_footer
-import plotly.graph_objects as go
-import plotly.express as px
+from sqlalchemy import func, desc
+from utils.database import SessionLocal, async_session, ProcurementNotice, NoticeRollup, Organization
+from utils.http_cache import cache_headers, is_not_modified, page_etag
+from utils.response_cache import cache_generation, response_cache
+from . import get_header, get_footer, not_modified, with_cache_headers
+from .static import assets_version, static_url
 from datetime import datetime, timedelta
 
+# plotly.js build matching the installed plotly package
+PLOTLY_JS_URL = 'https://cdn.plot.ly/plotly-4.1.1.min.js'
+
+# Uncached fragments built at once, each holding a pooled connection
+FRAGMENT_BUILD_CONCURRENCY = 2
+
+_fragment_builds = asyncio.Semaphore(FRAGMENT_BUILD_CONCURRENCY)
+
+
+def figure_spec(fig):
+    """Serialize a figure as compact JSON, without its layout template."""
+    from plotly.io.json import to_json_plotly
+    spec = fig.to_plotly_json()
+    spec['layout'].pop('template', None)
+    # to_json_plotly escapes '<' and '/', so the spec is safe inside <script>
+    return {'figure': to_json_plotly(spec)}
+
+
+@lru_cache(maxsize=1)
+def plotly_template_json():
+    """Return the default plotly layout template as JSON."""
+    import plotly.io as pio
+    from plotly.io.json import to_json_plotly
+    return to_json_plotly(pio.templates[pio.templates.default].to_plotly_json())
+
 
 def create_timeline_chart(db):
     """Create procurement volume timeline chart."""
     # Get daily counts for last 30 days
-    thirty_days_ago = datetime.now() - timedelta(days=30)
+    thirty_days_ago = (datetime.utcnow() - timedelta(days=30)).date()
     
     daily_data = db.query(
-        func.date(ProcurementNotice.created_at).label('date'),
-        func.count(ProcurementNotice.id).label('count')
+        NoticeRollup.day.label('date'),
+        func.sum(NoticeRollup.notice_count).label('count')
     ).filter(
-        ProcurementNotice.created_at >= thirty_days_ago
+        NoticeRollup.day >= thirty_days_ago
     ).group_by(
-        func.date(ProcurementNotice.created_at)
-    ).order_by('date').all()
+        NoticeRollup.day
+    ).order_by(NoticeRollup.day).all()
     
     if not daily_data:
-        return "<p>No data available for timeline</p>"
+        return {'empty': 'No data available for timeline'}
+    
+    import plotly.graph_objects as go
     
     dates = [str(d.date) for d in daily_data]
     counts = [d.count for d in daily_data]
@@ -53,24 +98,26 @@ def create_timeline_chart(db):
     fig.update_xaxes(showgrid=True, gridcolor='#E5E7EB')
     fig.update_yaxes(showgrid=True, gridcolor='#E5E7EB')
     
-    return fig.to_html(include_plotlyjs='cdn', div_id='timeline-chart')
+    return figure_spec(fig)
 
 
 def create_cpv_distribution_chart(db):
     """Create CPV category distribution pie chart."""
     cpv_data = db.query(
-        func.substring(ProcurementNotice.cpv_type, 1, 2).label('cpv_category'),
-        func.count(ProcurementNotice.id).label('count')
+        NoticeRollup.cpv_division.label('cpv_category'),
+        func.sum(NoticeRollup.notice_count).label('count')
     ).filter(
-        ProcurementNotice.cpv_type.isnot(None)
+        NoticeRollup.cpv_division != ''
     ).group_by(
-        'cpv_category'
+        NoticeRollup.cpv_division
+    ).having(
+        func.sum(NoticeRollup.notice_count) > 0
     ).order_by(
         desc('count')
     ).limit(10).all()
     
     if not cpv_data:
-        return "<p>No CPV data available</p>"
+        return {'empty': 'No CPV data available'}
     
     # CPV category names (first 2 digits)
     cpv_names = {
@@ -119,6 +166,9 @@ def create_cpv_distribution_chart(db):
         '98': 'Other Services'
     }
     
+    import plotly.graph_objects as go
+    from plotly.colors import qualitative
+    
     labels = [f"{d.cpv_category} - {cpv_names.get(d.cpv_category, 'Other')}" for d in cpv_data]
     values = [d.count for d in cpv_data]
     
@@ -126,7 +176,7 @@ def create_cpv_distribution_chart(db):
         labels=labels,
         values=values,
         hole=0.4,
-        marker=dict(colors=px.colors.qualitative.Set3)
+        marker=dict(colors=qualitative.Set3)
     )])
     
     fig.update_layout(
@@ -136,31 +186,39 @@ def create_cpv_distribution_chart(db):
         margin=dict(l=20, r=20, t=50, b=20)
     )
     
-    return fig.to_html(include_plotlyjs='cdn', div_id='cpv-chart')
+    return figure_spec(fig)
 
 
 def create_value_by_org_chart(db):
     """Create top organizations by total estimated value chart."""
     # Get top organizations by value
-    org_data = db.query(
-        ProcurementNotice.organization_name,
-        func.sum(
-            cast(ProcurementNotice.estimated_value, Numeric)
-        ).label('total_value'),
-        func.count(ProcurementNotice.id).label('count')
+    top_orgs = db.query(
+        NoticeRollup.organization_id,
+        func.sum(NoticeRollup.value_sum).label('total_value'),
+        func.sum(NoticeRollup.value_count).label('count')
     ).filter(
-        ProcurementNotice.organization_name.isnot(None),
-        ProcurementNotice.estimated_value.isnot(None),
-        ProcurementNotice.estimated_value != '',
-        ProcurementNotice.estimated_value.regexp_match(r'^\d+\.?\d*$')
+        NoticeRollup.organization_id != 0,
+        NoticeRollup.value_count > 0
     ).group_by(
-        ProcurementNotice.organization_name
+        NoticeRollup.organization_id
     ).order_by(
         desc('total_value')
-    ).limit(15).all()
+    ).limit(15).subquery()
+    
+    org_data = db.query(
+        func.coalesce(Organization.name, '').label('organization_name'),
+        top_orgs.c.total_value,
+        top_orgs.c.count
+    ).join(
+        top_orgs, Organization.id == top_orgs.c.organization_id
+    ).order_by(
+        desc(top_orgs.c.total_value)
+    ).all()
     
     if not org_data:
-        return "<p>No value data available</p>"
+        return {'empty': 'No value data available'}
+    
+    import plotly.graph_objects as go
     
     orgs = [d.organization_name[:40] + '...' if len(d.organization_name) > 40 else d.organization_name 
             for d in org_data]
@@ -196,24 +254,28 @@ def create_value_by_org_chart(db):
     
     fig.update_xaxes(showgrid=True, gridcolor='#E5E7EB')
     
-    return fig.to_html(include_plotlyjs='cdn', div_id='value-chart')
+    return figure_spec(fig)
 
 
 def create_notice_type_chart(db):
     """Create notice type distribution bar chart."""
     notice_data = db.query(
-        ProcurementNotice.notice_type,
-        func.count(ProcurementNotice.id).label('count')
+        NoticeRollup.notice_type,
+        func.sum(NoticeRollup.notice_count).label('count')
     ).filter(
-        ProcurementNotice.notice_type.isnot(None)
+        NoticeRollup.notice_type != ''
     ).group_by(
-        ProcurementNotice.notice_type
+        NoticeRollup.notice_type
+    ).having(
+        func.sum(NoticeRollup.notice_count) > 0
     ).order_by(
         desc('count')
     ).all()
     
     if not notice_data:
-        return "<p>No notice type data available</p>"
+        return {'empty': 'No notice type data available'}
+    
+    import plotly.graph_objects as go
     
     types = [d.notice_type for d in notice_data]
     counts = [d.count for d in notice_data]
@@ -246,7 +308,125 @@ def create_notice_type_chart(db):
     fig.update_xaxes(showgrid=False, tickangle=-45)
     fig.update_yaxes(showgrid=True, gridcolor='#E5E7EB')
     
-    return fig.to_html(include_plotlyjs='cdn', div_id='notice-type-chart')
+    return figure_spec(fig)
+
+
+def get_summary(db):
+    """Compute the dashboard's summary statistics."""
+    # Totals from the rollup table
+    total_notices, total_value = db.query(
+        func.coalesce(func.sum(NoticeRollup.notice_count), 0),
+        func.sum(NoticeRollup.value_sum)
+    ).one()
+    
+    # Count unique organizations
+    unique_orgs = db.query(func.count()).select_from(Organization).scalar()
+    
+    # Count notices with deadlines in next 30 days (time dependent,
+    # so not rolled up; served by the deadline index)
+    upcoming_deadline = datetime.now() + timedelta(days=30)
+    upcoming_count = db.query(
+        func.count()
+    ).filter(
+        ProcurementNotice.deadline_receipt_tenders_date.between(
+            datetime.now(),
+            upcoming_deadline
+        )
+    ).scalar()
+    
+    return {
+        'total_notices': int(total_notices),
+        'unique_orgs': unique_orgs,
+        'total_value': float(total_value or 0),
+        'upcoming_count': upcoming_count,
+    }
+
+
+# Dashboard charts by name: (builder, element id, height in pixels)
+CHARTS = {
+    'timeline': (create_timeline_chart, 'timeline-chart', 400),
+    'cpv': (create_cpv_distribution_chart, 'cpv-chart', 500),
+    'notice-types': (create_notice_type_chart, 'notice-type-chart', 400),
+    'value': (create_value_by_org_chart, 'value-chart', 600),
+}
+
+# Cached parts of the dashboard, by cache key (see utils/response_cache.py)
+ANALYTICS_FRAGMENTS = {
+    'analytics:summary': get_summary,
+    **{f'analytics:{name}-figure': build for name, (build, _, _) in CHARTS.items()},
+}
+
+
+async def get_fragment(db, key, generation):
+    """Return a dashboard fragment, from the response cache when possible.
+
+    Args:
+        db: Async database session
+        key: Fragment key from ANALYTICS_FRAGMENTS
+        generation: Current generation, see cache_generation()
+    """
+    fragment = response_cache and response_cache.get(key, generation)
+    if fragment is None:
+        async with _fragment_builds:
+            fragment = await db.run_sync(ANALYTICS_FRAGMENTS[key])
+        if response_cache:
+            response_cache.set(key, generation, fragment)
+    return fragment
+
+
+def chart(fragment, div_id):
+    """Render a chart fragment from a create_*_chart function.
+
+    Args:
+        fragment: {'figure': JSON spec} or {'empty': message}
+        div_id: id of the element the chart is drawn into
+    """
+    if 'empty' in fragment:
+        return P(fragment['empty'])
+    return Div(id=div_id), Script(NotStr(fragment['figure']), type='application/json',
+                                  cls='plotly-spec', data_target=div_id)
+
+
+def chart_slot(name, generation):
+    """Render a chart in place when cached, else a placeholder that loads it.
+
+    Placeholders fetch /analytics/chart/{name} with htmx once the page has
+    loaded, so uncached charts are built in parallel and never hold up the
+    rest of the page.
+    """
+    _, div_id, height = CHARTS[name]
+    cached = response_cache and response_cache.get(f'analytics:{name}-figure', generation)
+    if cached:
+        return chart(cached, div_id)
+    return Div(
+        P("Loading chart…", style="color: var(--muted-foreground);"),
+        hx_get=f'/analytics/chart/{name}', hx_trigger='load', hx_swap='innerHTML',
+        style=f"min-height: {height}px;"
+    )
+
+
+def analytics_cache_headers(req, generation, *parts):
+    """Cache headers of dashboard responses.
+
+    They change with the sync generation, and daily as the 30 day windows
+    (timeline, upcoming deadlines) move.
+    """
+    day = f"{datetime.utcnow():%Y%m%d}"
+    return cache_headers(page_etag(req, 'analytics', *parts, generation, day, assets_version(), weak=True))
+
+
+def warm_analytics_cache():
+    """Render every dashboard fragment of the current generation into the cache."""
+    if response_cache is None:
+        return
+    db = SessionLocal()
+    try:
+        generation = cache_generation(db)
+        response_cache.clear(keep_generation=generation)
+        for key, build in ANALYTICS_FRAGMENTS.items():
+            response_cache.set(key, generation, build(db))
+    finally:
+        db.close()
 
 
 def register_analytics_routes(rt):
@@ -257,47 +437,23 @@ def register_analytics_routes(rt):
     """
     
     @rt('/analytics')
-    def analytics():
+    async def analytics(req):
         """Analytics dashboard page with Plotly visualizations."""
-        db = SessionLocal()
-        try:
-            # Get summary statistics
-            total_notices = db.query(func.count(ProcurementNotice.id)).scalar()
-            
-            # Count unique organizations
-            unique_orgs = db.query(
-                func.count(func.distinct(ProcurementNotice.organization_name))
-            ).filter(
-                ProcurementNotice.organization_name.isnot(None)
-            ).scalar()
-            
-            # Calculate total estimated value
-            total_value = db.query(
-                func.sum(cast(ProcurementNotice.estimated_value, Numeric))
-            ).filter(
-                ProcurementNotice.estimated_value.isnot(None),
-                ProcurementNotice.estimated_value != '',
-                ProcurementNotice.estimated_value.regexp_match(r'^\d+\.?\d*$')
-            ).scalar()
+        async with async_session() as db:
+            # Everything below only changes when a sync succeeds
+            generation = await db.run_sync(cache_generation)
+            headers = analytics_cache_headers(req, generation)
+            if is_not_modified(req, headers['ETag']):
+                return not_modified(headers)
+            summary = await get_fragment(db, 'analytics:summary', generation)
             
-            # Count notices with deadlines in next 30 days
-            upcoming_deadline = datetime.now() + timedelta(days=30)
-            upcoming_count = db.query(
-                func.count(ProcurementNotice.id)
-            ).filter(
-                ProcurementNotice.deadline_receipt_tenders_date.between(
-                    datetime.now(),
-                    upcoming_deadline
-                )
-            ).scalar()
+            # Charts not cached yet load separately, after the stat cards
+            timeline = chart_slot('timeline', generation)
+            cpv = chart_slot('cpv', generation)
+            value = chart_slot('value', generation)
+            notice_type = chart_slot('notice-types', generation)
             
-            # Generate charts
-            timeline_html = create_timeline_chart(db)
-            cpv_html = create_cpv_distribution_chart(db)
-            value_html = create_value_by_org_chart(db)
-            notice_type_html = create_notice_type_chart(db)
-            
-            return Title("Analytics Dashboard"), get_header('analytics'), Main(
+            return with_cache_headers((Title("Analytics Dashboard"), get_header('analytics'), Main(
                 Div(
                     H1("Procurement Analytics Dashboard", style="margin: 2rem 0 1rem;"),
                     P("Interactive insights and trends from Latvian public procurement data", 
@@ -306,22 +462,22 @@ def register_analytics_routes(rt):
                     # Summary stats
                     Div(
                         Div(
-                            Div(f"{total_notices:,}", cls="stat-value"),
+                            Div(f"{summary['total_notices']:,}", cls="stat-value"),
                             Div("Total Procurements", cls="stat-label"),
                             cls="stat-card"
                         ),
                         Div(
-                            Div(f"{unique_orgs:,}", cls="stat-value"),
+                            Div(f"{summary['unique_orgs']:,}", cls="stat-value"),
                             Div("Contracting Authorities", cls="stat-label"),
                             cls="stat-card"
                         ),
                         Div(
-                            Div(f"€{float(total_value or 0):,.0f}", cls="stat-value"),
+                            Div(f"€{summary['total_value']:,.0f}", cls="stat-value"),
                             Div("Total Estimated Value", cls="stat-label"),
                             cls="stat-card"
                         ),
                         Div(
-                            Div(f"{upcoming_count:,}", cls="stat-value"),
+                            Div(f"{summary['upcoming_count']:,}", cls="stat-value"),
                             Div("Upcoming Deadlines (30d)", cls="stat-label"),
                             cls="stat-card"
                         ),
@@ -330,18 +486,18 @@ def register_analytics_routes(rt):
                     
                     # Timeline chart
                     Div(
-                        Div(NotStr(timeline_html), cls="card"),
+                        Div(timeline, cls="card"),
                         style="margin: 2rem 0;"
                     ),
                     
                     # Two column layout for charts
                     Div(
                         Div(
-                            Div(NotStr(cpv_html), cls="card"),
+                            Div(cpv, cls="card"),
                             style="grid-column: 1;"
                         ),
                         Div(
-                            Div(NotStr(notice_type_html), cls="card"),
+                            Div(notice_type, cls="card"),
                             style="grid-column: 2;"
                         ),
                         style="display: grid; grid-template-columns: 1fr 1fr; gap: 2rem; margin: 2rem 0;"
@@ -349,12 +505,33 @@ def register_analytics_routes(rt):
                     
                     # Value by organization chart
                     Div(
-                        Div(NotStr(value_html), cls="card"),
+                        Div(value, cls="card"),
                         style="margin: 2rem 0;"
                     ),
                     
                     cls="container"
-                )
-            ), get_footer()
-        finally:
-            db.close()
+                ),
+                Script(src=PLOTLY_JS_URL, defer=True),
+                Script(src=static_url('charts.js'), defer=True)
+            ), get_footer()), headers)
+    
+    @rt('/analytics/chart/{name}')
+    async def analytics_chart(req, name: str):
+        """One dashboard chart, loaded by the placeholders of chart_slot()."""
+        if name not in CHARTS:
+            return Response('Unknown chart', status_code=404)
+        async with async_session() as db:
+            generation = await db.run_sync(cache_generation)
+            headers = analytics_cache_headers(req, generation, name)
+            if is_not_modified(req, headers['ETag']):
+                return not_modified(headers)
+            fragment = await get_fragment(db, f'analytics:{name}-figure', generation)
+            return with_cache_headers(chart(fragment, CHARTS[name][1]), headers)
+    
+    @rt('/analytics/plotly-template.json')
+    def plotly_template():
+        """Layout template applied to every chart by static/charts.js."""
+        return Response(
+            plotly_template_json(), media_type='application/json',
+            headers={'Cache-Control': 'public, max-age=86400'}
+        )
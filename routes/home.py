@@ -1,7 +1,7 @@
 """Home page route."""
 from fasthtml.common import *
-from sqlalchemy import desc
-from utils.database import SessionLocal, DataSyncLog
+from sqlalchemy import desc, select
+from utils.database import async_session, DataSyncLog
 from . import get_header, get_footer
 
 
@@ -13,12 +13,11 @@ def register_home_routes(rt):
     """
     
     @rt('/')
-    def index():
+    async def index():
         """Home page."""
-        db = SessionLocal()
-        try:
+        async with async_session() as db:
             # Get latest sync status
-            sync_status = db.query(DataSyncLog).order_by(desc(DataSyncLog.created_at)).first()
+            sync_status = await db.scalar(select(DataSyncLog).order_by(desc(DataSyncLog.created_at)).limit(1))
             
             return Title("Latvia Procurement Monitor"), get_header('home'), Main(
                 Div(
@@ -64,6 +63,7 @@ def register_home_routes(rt):
                             P(f"Records Processed: {sync_status.records_processed if sync_status else 0}"),
                             P(f"New Records: {sync_status.records_added if sync_status else 0}"),
                             P(f"Updated Records: {sync_status.records_updated if sync_status else 0}"),
+                            P(f"Unchanged Records: {(sync_status.records_unchanged or 0) if sync_status else 0}"),
                             cls="card"
                         ) if sync_status else "",
                         cls="container",
@@ -72,5 +72,3 @@ def register_home_routes(rt):
                     cls="container"
                 )
             ), get_footer()
-        finally:
-            db.close()
@@ -0,0 +1,19 @@
+"""Prometheus metrics route."""
+from fasthtml.common import *
+from utils.metrics import render_metrics
+
+# Content type of the Prometheus text exposition format
+METRICS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def register_metrics_routes(rt):
+    """Register the /metrics route.
+    
+    Args:
+        rt: FastHTML route decorator
+    """
+    
+    @rt('/metrics')
+    def metrics():
+        """Request, query and connection pool metrics of this process."""
+        return Response(render_metrics(), media_type=METRICS_MEDIA_TYPE, headers={'Cache-Control': 'no-store'})
@@ -1,13 +1,21 @@
 """Procurement routes - list and detail pages with enriched field display."""
+from urllib.parse import quote
 from fasthtml.common import *
-from sqlalchemy import desc, or_
-from utils.database import SessionLocal, ProcurementNotice
-from . import get_header, get_footer
+from sqlalchemy import desc, select
+from utils.compression import choose_encoding
+from utils.database import async_session, get_async_engine, NoticeIdentifier, ProcurementNotice
+from utils.export import EXPORT_MEDIA_TYPES, export_statement, gzip_chunks, parse_since, stream_export
+from utils.http_cache import cache_headers, is_not_modified, page_etag
+from utils.pagination import count_rows, keyset_page
+from utils.response_cache import cache_generation
+from utils.search import apply_search
+from . import get_header, get_footer, not_modified, with_cache_headers
+from .static import assets_version
 
 
 def format_value(value, currency='EUR'):
     """Format estimated value with currency."""
-    if not value or value == '':
+    if value is None or value == '':
         return 'N/A'
     try:
         num_value = float(value)
@@ -16,6 +24,38 @@ def format_value(value, currency='EUR'):
         return f"{currency} {value}"
 
 
+def notice_url(identifier):
+    """Return the detail page URL of a notice."""
+    return f"/notice/{quote(identifier)}"
+
+
+def notice_not_found():
+    """Detail page for an unknown notice."""
+    return Title("Not Found"), get_header(), Main(
+        Div(
+            H1("Procurement Notice Not Found"),
+            P("The requested procurement notice could not be found."),
+            A("Back to List", href="/procurements", cls="btn btn-primary"),
+            cls="container",
+            style="text-align: center; padding: 4rem 0;"
+        )
+    ), get_footer()
+
+
+def filter_notices(query, search, notice_type, dialect):
+    """Apply the list page's search and notice type filters to a query.
+    
+    Returns:
+        tuple: (filtered query, rank expression or None, see apply_search)
+    """
+    rank = None
+    if search:
+        query, rank = apply_search(query, search, dialect)
+    if notice_type and notice_type != 'all':
+        query = query.filter(ProcurementNotice.notice_type == notice_type)
+    return query, rank
+
+
 def register_procurement_routes(rt):
     """Register procurement-related routes.
     
@@ -24,33 +64,44 @@ def register_procurement_routes(rt):
     """
     
     @rt('/procurements')
-    def procurements(search: str = '', notice_type: str = '', page: int = 1):
-        """Procurement list page with search and filters - enriched with all fields."""
-        db = SessionLocal()
-        try:
+    async def procurements(req, search: str = '', notice_type: str = '', sort: str = '', page: int = 1,
+                           after: str = '', before: str = '', total: str = ''):
+        """Procurement list page with search and filters - enriched with all fields.
+        
+        The default newest-first order pages with after/before cursors; value
+        and relevance sorts page by number. total=exact asks for an exact
+        result count instead of an estimate. Results only change when a sync
+        succeeds, so revalidating clients get a 304 until the next one.
+        """
+        async with async_session() as db:
+            generation = await db.run_sync(cache_generation)
+            headers = cache_headers(page_etag(req, 'list', generation, assets_version(), weak=True))
+            if is_not_modified(req, headers['ETag']):
+                return not_modified(headers)
+            
             limit = 20
             offset = (page - 1) * limit
+            keyset = sort not in ('value', 'relevance') or (sort == 'relevance' and not search)
             
             # Build query
-            query = db.query(ProcurementNotice)
+            query, rank = filter_notices(select(ProcurementNotice), search, notice_type, db.get_bind().dialect.name)
             
-            if search:
-                search_filter = or_(
-                    ProcurementNotice.name.ilike(f'%{search}%'),
-                    ProcurementNotice.organization_name.ilike(f'%{search}%'),
-                    ProcurementNotice.cpv_type.ilike(f'%{search}%'),
-                    ProcurementNotice.description.ilike(f'%{search}%')
-                )
-                query = query.filter(search_filter)
+            result_count, estimated = await count_rows(db, query, exact=(total == 'exact'))
+            total_pages = (result_count + limit - 1) // limit
             
-            if notice_type and notice_type != 'all':
-                query = query.filter(ProcurementNotice.notice_type == notice_type)
+            next_cursor = prev_cursor = None
+            if keyset:
+                notices, next_cursor, prev_cursor = await keyset_page(db, query, after=after, before=before, limit=limit)
+            else:
+                if sort == 'value':
+                    order = (ProcurementNotice.estimated_amount.desc().nulls_last(), desc(ProcurementNotice.created_at))
+                else:
+                    order = (desc(rank), desc(ProcurementNotice.created_at)) if rank is not None else (desc(ProcurementNotice.created_at),)
+                notices = (await db.scalars(query.order_by(*order).offset(offset).limit(limit))).all()
             
-            total = query.count()
-            notices = query.order_by(desc(ProcurementNotice.created_at)).offset(offset).limit(limit).all()
-            total_pages = (total + limit - 1) // limit
+            base_url = f"/procurements?search={search}&notice_type={notice_type}&sort={sort}"
             
-            return Title("Browse Procurements"), get_header('procurements'), Main(
+            return with_cache_headers((Title("Browse Procurements"), get_header('procurements'), Main(
                 Div(
                     H1("Search Procurement Notices", style="margin: 2rem 0 1rem;"),
                     
@@ -64,12 +115,19 @@ def register_procurement_routes(rt):
                             Option("Discussion", value="sps-discussion", selected=(notice_type == 'sps-discussion')),
                             name="notice_type"
                         ),
+                        Select(
+                            Option("Newest First", value="", selected=(sort not in ('value', 'relevance'))),
+                            Option("Highest Value", value="value", selected=(sort == 'value')),
+                            Option("Best Match", value="relevance", selected=(sort == 'relevance')),
+                            name="sort"
+                        ),
                         Button("Search", type="submit", cls="btn btn-primary"),
                         method="get",
                         cls="search-form"
                     ),
                     
-                    P(f"Showing {offset + 1} - {min(offset + limit, total)} of {total} results", 
+                    P(f"Showing {len(notices)} of {'about ' if estimated else ''}{result_count:,} results",
+                      A("exact count", href=f"{base_url}&total=exact", style="margin-left: 0.5rem;") if estimated else "",
                       style="color: var(--muted-foreground); font-size: 0.875rem; margin-bottom: 1rem;"),
                     
                     # Results - enriched cards
@@ -103,7 +161,7 @@ def register_procurement_routes(rt):
                                     ),
                                     Div(
                                         Div("💰 Estimated Value", style="font-size: 0.75rem; color: var(--muted-foreground); margin-bottom: 0.25rem;"),
-                                        Div(format_value(notice.estimated_value, notice.currency or 'EUR'), 
+                                        Div(format_value(notice.estimated_amount if notice.estimated_amount is not None else notice.estimated_value, notice.currency or 'EUR'), 
                                             style="font-weight: 600; font-size: 1rem; color: var(--primary);"),
                                     ),
                                     Div(
@@ -123,13 +181,13 @@ def register_procurement_routes(rt):
                                     Span(f"⏰ Deadline: {notice.deadline_receipt_tenders_date.strftime('%Y-%m-%d %H:%M')}" if notice.deadline_receipt_tenders_date else ""),
                                     Span(f"📄 Documents" if notice.documents_url else ""),
                                     Span(f"📝 Submission Portal" if notice.submission_url else ""),
-                                    Span(f"🕐 Added: {notice.created_at.strftime('%Y-%m-%d')}" if notice.created_at else ""),
+                                    Span(f"🕐 Published: {notice.created_at.strftime('%Y-%m-%d')}" if notice.created_at else ""),
                                     cls="meta-info"
                                 ),
                                 
                                 cls="card"
                             ),
-                            href=f"/procurement/{notice.id}",
+                            href=notice_url(notice.identifier),
                             style="text-decoration: none; color: inherit;"
                         )
                         for notice in notices
@@ -140,41 +198,95 @@ def register_procurement_routes(rt):
                     
                     # Pagination
                     Div(
-                        A("← Previous", href=f"/procurements?search={search}&notice_type={notice_type}&page={page-1}", 
+                        A("← Newer", href=f"{base_url}&before={prev_cursor}", cls="btn btn-outline",
+                          style="opacity: 0.5; pointer-events: none;" if not prev_cursor else ""),
+                        A("Older →", href=f"{base_url}&after={next_cursor}", cls="btn btn-outline",
+                          style="opacity: 0.5; pointer-events: none;" if not next_cursor else ""),
+                        cls="pagination"
+                    ) if keyset and (prev_cursor or next_cursor) else Div(
+                        A("← Previous", href=f"{base_url}&page={page-1}", 
                           cls="btn btn-outline" if page > 1 else "btn btn-outline", 
                           style="opacity: 0.5; pointer-events: none;" if page <= 1 else ""),
-                        Span(f"Page {page} of {total_pages}"),
-                        A("Next →", href=f"/procurements?search={search}&notice_type={notice_type}&page={page+1}", 
+                        Span(f"Page {page} of {'about ' if estimated else ''}{total_pages:,}"),
+                        A("Next →", href=f"{base_url}&page={page+1}", 
                           cls="btn btn-outline" if page < total_pages else "btn btn-outline",
                           style="opacity: 0.5; pointer-events: none;" if page >= total_pages else ""),
                         cls="pagination"
-                    ) if total_pages > 1 else "",
+                    ) if not keyset and total_pages > 1 else "",
                     
                     cls="container"
                 )
-            ), get_footer()
-        finally:
-            db.close()
+            ), get_footer()), headers)
     
-    @rt('/procurement/{id}')
-    def procurement_detail(id: int):
-        """Procurement detail page with all fields displayed."""
-        db = SessionLocal()
+    @rt('/procurements/export.{fmt}')
+    async def export_procurements(req, fmt: str, search: str = '', notice_type: str = '', since: str = ''):
+        """Stream every notice matching the list filters as CSV or JSON Lines.
+        
+        since (ISO 8601) limits the export to notices updated from then on,
+        for incremental pulls. Clients accepting gzip get a compressed stream.
+        """
+        if fmt not in EXPORT_MEDIA_TYPES:
+            return Response('Unknown export format', status_code=404)
         try:
-            notice = db.query(ProcurementNotice).filter(ProcurementNotice.id == id).first()
+            since_at = parse_since(since) if since else None
+        except ValueError:
+            return Response('since must be an ISO 8601 date or datetime', status_code=400)
+        
+        query, _ = filter_notices(select(ProcurementNotice), search, notice_type, get_async_engine().dialect.name)
+        body = stream_export(export_statement(query, since_at), fmt)
+        # CompressionMiddleware adds Vary: Accept-Encoding
+        headers = {'Content-Disposition': f'attachment; filename="procurements.{fmt}"'}
+        if choose_encoding(req.headers.get('accept-encoding', ''), offered=('gzip',)):
+            body = gzip_chunks(body)
+            headers['Content-Encoding'] = 'gzip'
+        return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
+    
+    @rt('/procurement/{id}')
+    async def procurement_by_id(id: int):
+        """Redirect the old id URLs of the detail page to notice URLs.
+        
+        An id does not tell which monthly partition holds the notice, so
+        this lookup reads every partition's index; pages link to the
+        identifier URL instead.
+        """
+        async with async_session() as db:
+            identifier = await db.scalar(select(ProcurementNotice.identifier).where(ProcurementNotice.id == id).limit(1))
+        if identifier is None:
+            return notice_not_found()
+        return RedirectResponse(notice_url(identifier), status_code=301)
+    
+    @rt('/notice/{identifier:path}')
+    async def procurement_detail(req, identifier: str):
+        """Procurement detail page with all fields displayed.
+        
+        The notice's created_at (the partition key) comes from the
+        notice_identifiers registry, so the notice is read from a single
+        partition. The page only changes when the notice's updated_at
+        moves, so that is looked up first and revalidating clients get a
+        304 without the notice being loaded or rendered.
+        """
+        async with async_session() as db:
+            created_at = await db.scalar(
+                select(NoticeIdentifier.created_at).where(NoticeIdentifier.identifier == identifier)
+            )
+            located = (ProcurementNotice.identifier == identifier, ProcurementNotice.created_at == created_at)
+            version = created_at and (await db.execute(
+                select(ProcurementNotice.id, ProcurementNotice.updated_at, ProcurementNotice.created_at).where(*located)
+            )).first()
+            headers = {}
+            if version:
+                last_modified = version.updated_at or version.created_at
+                etag = page_etag(req, 'notice', version.id, f"{last_modified:%Y%m%d%H%M%S%f}", assets_version())
+                headers = cache_headers(etag, last_modified)
+                if is_not_modified(req, etag, last_modified):
+                    return not_modified(headers)
+            
+            notice = version and await db.scalar(select(ProcurementNotice).where(*located))
             
             if not notice:
-                return Title("Not Found"), get_header(), Main(
-                    Div(
-                        H1("Procurement Notice Not Found"),
-                        P("The requested procurement notice could not be found."),
-                        A("Back to List", href="/procurements", cls="btn btn-primary"),
-                        cls="container",
-                        style="text-align: center; padding: 4rem 0;"
-                    )
-                ), get_footer()
+                return notice_not_found()
             
-            return Title(notice.name or "Procurement Detail"), get_header(), Main(
+            return with_cache_headers((Title(notice.name or "Procurement Detail"), get_header(), Main(
                 Div(
                     A("← Back to List", href="/procurements", cls="btn btn-outline", style="margin: 2rem 0 1rem;"),
                     
@@ -219,7 +331,7 @@ def register_procurement_routes(rt):
                             ) if notice.main_nature_type else "",
                             Div(
                                 Div("Estimated Value", cls="detail-label"),
-                                Div(format_value(notice.estimated_value, notice.currency or 'EUR'), 
+                                Div(format_value(notice.estimated_amount if notice.estimated_amount is not None else notice.estimated_value, notice.currency or 'EUR'), 
                                     cls="detail-value", style="font-size: 1.5rem; font-weight: 600; color: var(--primary);"),
                                 cls="detail-item"
                             ),
@@ -307,8 +419,8 @@ def register_procurement_routes(rt):
                         H2("Record Information"),
                         Div(
                             Div(
-                                Div("Created", cls="detail-label"),
-                                Div(notice.created_at.strftime('%Y-%m-%d %H:%M:%S') if notice.created_at else "N/A", cls="detail-value"),
+                                Div("Published", cls="detail-label"),
+                                Div(notice.created_at.strftime('%Y-%m-%d') if notice.created_at else "N/A", cls="detail-value"),
                                 cls="detail-item"
                             ),
                             Div(
@@ -329,6 +441,4 @@ def register_procurement_routes(rt):
                     
                     cls="container"
                 )
-            ), get_footer()
-        finally:
-            db.close()
+            ), get_footer()), headers)
@@ -0,0 +1,78 @@
+"""Static files with content-hashed URLs.
+
+Pages link assets through static_url(), which puts a hash of the file's
+content into its name (/static/styles.1a2b3c4d5e.css). Those URLs never
+change content, so they are served as immutable for a year; an edited file
+gets a new URL. Plain /static/ URLs still work, with a short max-age.
+"""
+import hashlib
+import os
+import re
+from functools import lru_cache
+from fasthtml.common import *
+
+STATIC_DIR = 'static'
+
+# Cache-Control of content-hashed and of plain static URLs
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+STATIC_CACHE_CONTROL = 'public, max-age=300'
+
+_HASHED_NAME = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{10})(?P<ext>\.[^./]+)$')
+
+
+@lru_cache(maxsize=128)
+def _content_hash(path, mtime_ns):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+
+def asset_hash(name):
+    """Return the content hash of a file in the static directory.
+
+    Hashes are remembered per modification time, so edits show up without
+    a restart.
+    """
+    path = os.path.join(STATIC_DIR, name)
+    return _content_hash(path, os.stat(path).st_mtime_ns)
+
+
+def static_url(name):
+    """Return the content-hashed URL of a file in the static directory."""
+    stem, ext = os.path.splitext(name)
+    return f'/static/{stem}.{asset_hash(name)}{ext}'
+
+
+def assets_version():
+    """Return a hash of every static file, for ETags of pages linking them."""
+    names = sorted(
+        os.path.relpath(os.path.join(dirpath, filename), STATIC_DIR)
+        for dirpath, _, filenames in os.walk(STATIC_DIR) for filename in filenames
+    )
+    digest = hashlib.sha256(''.join(f'{name}:{asset_hash(name)};' for name in names).encode())
+    return digest.hexdigest()[:10]
+
+
+def register_static_routes(rt):
+    """Register the static file route.
+
+    Args:
+        rt: FastHTML route decorator
+    """
+
+    @rt('/static/{fname:path}')
+    async def static(fname: str):
+        """Serve static files from the static directory."""
+        name, cache_control = fname, STATIC_CACHE_CONTROL
+        match = _HASHED_NAME.match(fname)
+        if match and not os.path.isfile(os.path.join(STATIC_DIR, fname)):
+            name = match['stem'] + match['ext']
+
+        root = os.path.realpath(STATIC_DIR)
+        path = os.path.realpath(os.path.join(root, name))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return Response('Not found', status_code=404)
+        # An outdated hash (a page rendered before a deploy) gets the current
+        # file, but not as immutable
+        if name != fname and match['hash'] == asset_hash(name):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        return FileResponse(path, headers={'Cache-Control': cache_control})
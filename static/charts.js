@@ -0,0 +1,38 @@
+// Draws the JSON figure specs emitted by routes/analytics.py with plotly.js.
+// Each spec is a <script type="application/json" class="plotly-spec">
+// whose data-target names the element to draw into. Specs come without the
+// layout template, which is fetched once and shared by every chart.
+(function () {
+  var template = null;
+
+  function loadTemplate() {
+    if (!template) {
+      template = fetch('/analytics/plotly-template.json')
+        .then(function (response) { return response.ok ? response.json() : null; })
+        .catch(function () { return null; });
+    }
+    return template;
+  }
+
+  function renderCharts(root) {
+    var specs = (root || document).querySelectorAll('script.plotly-spec:not([data-rendered])');
+    if (!specs.length) return;
+    specs.forEach(function (script) { script.setAttribute('data-rendered', ''); });
+    loadTemplate().then(function (layoutTemplate) {
+      specs.forEach(function (script) {
+        var spec = JSON.parse(script.textContent);
+        if (layoutTemplate) spec.layout.template = layoutTemplate;
+        Plotly.newPlot(script.dataset.target, spec.data, spec.layout, {responsive: true});
+      });
+    });
+  }
+
+  window.renderCharts = renderCharts;
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', function () { renderCharts(document); });
+  } else {
+    renderCharts(document);
+  }
+  // Charts loaded later as htmx fragments (see chart_slot in routes/analytics.py)
+  document.addEventListener('htmx:afterSettle', function () { renderCharts(document); });
+})();
@@ -5,12 +5,24 @@ Usage:
     python sync.py              # Sync latest data (yesterday or 2 days ago)
     python sync.py once         # Same as above
     python sync.py backfill 7   # Backfill last 7 days
+    python sync.py backfill 365 --workers 8 --rate 4   # Concurrent backfill
     python sync.py range 2025-11-01 2025-11-15  # Sync specific date range
+    python sync.py gaps 2025-01-01 --sync   # Re-sync missing or failed days
+    python sync.py load-dir /data/iub-archive  # Bulk load local daily files via COPY
+    python sync.py replay       # Re-ingest all cached payloads offline
+    python sync.py rebuild-rollups  # Recompute the analytics rollup table
+    python sync.py partitions   # List the monthly notice partitions
+    python sync.py detach-partition 2024-01  # Detach a month for archiving
     python sync.py scheduler    # Run continuous scheduler (daily at 2 AM)
 """
-import sys
-from utils.scheduler import *
+from utils.response_cache import set_cache_warmer
+from utils.scheduler import main
 
 if __name__ == '__main__':
-    # Forward to scheduler module
-    pass  # The scheduler module's __main__ block will handle this
+    # Re-render the cached analytics after syncs; needs the web dependencies
+    try:
+        from routes.analytics import warm_analytics_cache
+        set_cache_warmer(warm_analytics_cache)
+    except ImportError:
+        pass
+    main()
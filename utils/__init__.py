@@ -1,10 +1,16 @@
 """Utilities package for tenders-lv application."""
 from .database import (
     SessionLocal,
+    AsyncSessionLocal,
+    Organization,
+    NoticeIdentifier,
     ProcurementNotice,
     DataSyncLog,
+    SyncState,
+    NoticeRollup,
     init_db,
-    get_db
+    get_db,
+    async_session
 )
 from .ingestion import (
     fetch_procurement_data,
@@ -14,10 +20,16 @@ from .ingestion import (
 
 __all__ = [
     'SessionLocal',
+    'AsyncSessionLocal',
+    'Organization',
+    'NoticeIdentifier',
     'ProcurementNotice',
     'DataSyncLog',
+    'SyncState',
+    'NoticeRollup',
     'init_db',
     'get_db',
+    'async_session',
     'fetch_procurement_data',
     'sync_date',
     'sync_latest_data',
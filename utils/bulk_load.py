@@ -0,0 +1,264 @@
+"""Offline bulk loader for a local archive of daily notice files.
+
+Walks a directory (or a tarball) of IUB daily JSON files, streams every
+normalized notice into a temporary staging table with PostgreSQL COPY and
+merges the staging table into tenders_lv.procurement_notices with one
+INSERT ... SELECT ... ON CONFLICT statement. No HTTP and no per-row ORM work.
+
+When an identifier repeats, the row from the file with the latest date in
+its name wins (then the later name, then the later position in the file),
+so the result does not depend on the order of the members in a tarball.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tarfile
+import time
+from datetime import datetime
+from .database import engine, SessionLocal, DataSyncLog
+from .ingestion import NOTICE_COLUMNS, STREAM_CHUNK_SIZE, iter_json_array, normalize_notice, record_sync_state
+from .organizations import organization_key
+from .partitions import ensure_notice_partitions
+from .response_cache import refresh_response_cache
+from .rollups import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered in memory before they are sent to the server with COPY
+COPY_BATCH_ROWS = 50000
+
+_DATE_IN_NAME = re.compile(r'(\d{2})-(\d{2})-(\d{4})\.json$')
+
+
+def publication_date_from_name(name):
+    """Return the date encoded in a DD-MM-YYYY.json file name, or None."""
+    match = _DATE_IN_NAME.search(name)
+    if not match:
+        return None
+    day, month, year = match.groups()
+    return datetime(int(year), int(month), int(day)).date()
+
+
+def iter_archive_files(path):
+    """Yield (name, binary file object) for every daily JSON file in an archive.
+    
+    Args:
+        path: Directory (searched recursively) or tar archive (any compression)
+    """
+    if os.path.isdir(path):
+        names = []
+        for dirpath, _, filenames in os.walk(path):
+            names.extend(os.path.join(dirpath, f) for f in filenames if f.endswith('.json'))
+        # Oldest first, so later files win when an identifier repeats
+        names.sort(key=lambda name: (publication_date_from_name(name) or datetime.min.date(), name))
+        for name in names:
+            with open(name, 'rb') as f:
+                yield name, f
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith('.json'):
+                    yield member.name, archive.extractfile(member)
+    else:
+        raise ValueError(f"{path} is neither a directory nor a tar archive")
+
+
+def _copy_value(value):
+    """Format a value for COPY ... FROM STDIN (text format)."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _hashing_chunks(fileobj, digest):
+    while True:
+        chunk = fileobj.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            return
+        digest.update(chunk)
+        yield chunk
+
+
+def load_directory(path):
+    """Load an archive of daily JSON files into the database.
+    
+    Args:
+        path: Directory or tar archive of files named like DD-MM-YYYY.json
+    
+    Returns:
+        dict: Load results with file and record counts
+    """
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError("load-dir requires PostgreSQL (COPY)")
+    
+    started = time.monotonic()
+    columns = ', '.join(NOTICE_COLUMNS)
+    staged_columns = ', '.join(f"s.{column}" for column in NOTICE_COLUMNS)
+    update_columns = ', '.join(
+        f"{column} = EXCLUDED.{column}" for column in NOTICE_COLUMNS + ('organization_id',) if column != 'identifier'
+    )
+    copy_sql = f"COPY notice_staging (seq, publication_date, file_name, {columns}, org_key) FROM STDIN"
+    # Staged rows from the latest file first, see the module docstring
+    latest_first = "publication_date DESC NULLS LAST, file_name DESC, seq DESC"
+    
+    files = records_processed = seq = 0
+    loaded_dates = {}
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # Kept across the commit below; a failed load on this pooled
+        # connection may have left one behind
+        cursor.execute("DROP TABLE IF EXISTS notice_staging")
+        cursor.execute(
+            f"CREATE TEMP TABLE notice_staging AS "
+            f"SELECT 0::bigint AS seq, NULL::date AS publication_date, ''::text AS file_name, "
+            f"{columns}, ''::varchar(255) AS org_key "
+            f"FROM tenders_lv.procurement_notices WITH NO DATA"
+        )
+        
+        buffer = io.StringIO()
+        buffered = 0
+        
+        def flush():
+            nonlocal buffer, buffered
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            buffer = io.StringIO()
+            buffered = 0
+        
+        for name, fileobj in iter_archive_files(path):
+            publication_date = publication_date_from_name(name)
+            file_prefix = [_copy_value(publication_date), _copy_value(name)]
+            digest = hashlib.sha256()
+            file_records = 0
+            for notice_data in iter_json_array(_hashing_chunks(fileobj, digest)):
+                file_records += 1
+                try:
+                    row = normalize_notice(notice_data)
+                except Exception as e:
+                    logger.error(f"Error processing notice in {name}: {e}")
+                    continue
+                if row is None:
+                    continue
+                seq += 1
+                buffer.write('\t'.join(
+                    [str(seq)] + file_prefix + [_copy_value(row[c]) for c in NOTICE_COLUMNS]
+                    + [_copy_value(organization_key(row))]
+                ))
+                buffer.write('\n')
+                buffered += 1
+                if buffered >= COPY_BATCH_ROWS:
+                    flush()
+            
+            files += 1
+            records_processed += file_records
+            if publication_date:
+                loaded_dates[publication_date] = (file_records, digest.hexdigest())
+            logger.info(f"Staged {name}: {file_records} notices")
+        
+        if buffered:
+            flush()
+        
+        # Creating a partition needs an exclusive lock on the parent table,
+        # which staging (CREATE TABLE AS ... FROM it) holds a share of
+        # until it commits. Notices from files without a date go to now.
+        connection.commit()
+        ensure_notice_partitions(
+            engine, datetime.utcnow(), *(datetime(day.year, day.month, day.day) for day in loaded_dates)
+        )
+        
+        # Organizations first, the latest name and city seen win
+        cursor.execute(f"""
+            INSERT INTO tenders_lv.organizations (key, identifier, name, city, created_at, updated_at)
+            SELECT DISTINCT ON (org_key) org_key, organization_identifier, organization_name, organization_city,
+                   now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+            FROM notice_staging
+            WHERE org_key IS NOT NULL
+            ORDER BY org_key, {latest_first}
+            ON CONFLICT (key) DO UPDATE SET name = EXCLUDED.name, city = EXCLUDED.city, updated_at = EXCLUDED.updated_at
+            WHERE (organizations.name, organizations.city) IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.city)
+        """)
+        
+        # New identifiers get their created_at (and so their partition) here,
+        # the earliest publication date they appear on; every identifier
+        # registered now is a notice added by this load
+        cursor.execute("""
+            WITH registered AS (
+                INSERT INTO tenders_lv.notice_identifiers (identifier, created_at)
+                SELECT identifier, coalesce(min(publication_date)::timestamp, now() AT TIME ZONE 'utc')
+                FROM notice_staging GROUP BY identifier
+                ON CONFLICT (identifier) DO NOTHING
+                RETURNING identifier
+            )
+            SELECT count(*) FROM registered
+        """)
+        records_added = cursor.fetchone()[0]
+        
+        # Last occurrence of each identifier wins, unchanged rows are left alone
+        cursor.execute(f"""
+            WITH merged AS (
+                INSERT INTO tenders_lv.procurement_notices ({columns}, organization_id, created_at, updated_at)
+                SELECT DISTINCT ON (s.identifier) {staged_columns}, o.id,
+                       r.created_at, now() AT TIME ZONE 'utc'
+                FROM notice_staging s
+                JOIN tenders_lv.notice_identifiers r ON r.identifier = s.identifier
+                LEFT JOIN tenders_lv.organizations o ON o.key = s.org_key
+                ORDER BY s.identifier, {latest_first}
+                ON CONFLICT (identifier, created_at) DO UPDATE SET {update_columns}, updated_at = EXCLUDED.updated_at
+                WHERE procurement_notices.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                RETURNING 1
+            )
+            SELECT count(*) FROM merged
+        """)
+        records_updated = cursor.fetchone()[0] - records_added
+        cursor.execute("SELECT count(DISTINCT identifier) FROM notice_staging")
+        records_unchanged = cursor.fetchone()[0] - records_added - records_updated
+        cursor.execute("DROP TABLE notice_staging")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    
+    # Record the load so 'gaps' and backfills know these days are done, and
+    # recompute the analytics rollups the merge bypassed
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db)
+        now = datetime.utcnow()
+        for publication_date, (file_records, payload_hash) in loaded_dates.items():
+            record_sync_state(
+                db, publication_date, status='success', records_processed=file_records,
+                records_added=None, records_updated=None, records_unchanged=None,
+                payload_hash=payload_hash, error_message=None, finished_at=now
+            )
+        db.add(DataSyncLog(
+            status='success',
+            records_processed=records_processed,
+            records_added=records_added,
+            records_updated=records_updated,
+            records_unchanged=records_unchanged
+        ))
+        db.commit()
+    finally:
+        db.close()
+    refresh_response_cache()
+    
+    elapsed = time.monotonic() - started
+    logger.info(f"✅ Loaded {files} file(s) from {path} in {elapsed:.1f}s: {records_processed} processed, "
+                f"{records_added} added, {records_updated} updated, {records_unchanged} unchanged")
+    return {
+        'status': 'success',
+        'files': files,
+        'processed': records_processed,
+        'added': records_added,
+        'updated': records_updated,
+        'unchanged': records_unchanged,
+        'seconds': elapsed
+    }
@@ -0,0 +1,212 @@
+"""Response compression, brotli or gzip as negotiated by Accept-Encoding.
+
+CompressionMiddleware compresses complete text responses of at least
+COMPRESSION_MIN_SIZE bytes. Streamed responses (the exports, which gzip
+themselves) and responses that already have a Content-Encoding pass
+through uncompressed. The middleware owns Vary: Accept-Encoding and adds
+it once to every response whose encoding may depend on the request
+header. Compressing changes the bytes but not the content, so
+strong ETags are sent weak, as route validators compare weakly anyway.
+
+Compressed bodies of cacheable responses (those with a Cache-Control that
+allows storing them) are kept in a small in-process LRU keyed by a digest
+of the uncompressed body, so identical pages are not compressed again.
+brotli is optional; without it only gzip is offered.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller responses are sent as they are
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
+# Compression levels; brotli 5 is about as fast as gzip 6 and smaller
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Upper bound for the total size of cached compressed bodies
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_MB', '32')) * 1024 * 1024
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml'
+)
+
+
+def supported_encodings():
+    """Return the content codings offered, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding, offered=None):
+    """Pick the content coding for an Accept-Encoding header.
+
+    Args:
+        accept_encoding: Accept-Encoding header value
+        offered: Codings to choose from, most preferred first
+            (default: supported_encodings())
+
+    Returns:
+        str: 'br', 'gzip', or None to send the body as it is
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            weights[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in offered or supported_encodings():
+        quality = weights.get(coding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body, coding):
+    """Compress a body with a content coding from supported_encodings()."""
+    if coding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies, bounded by their total size.
+
+    Args:
+        max_bytes: Upper bound for the total size of cached bodies
+    """
+
+    def __init__(self, max_bytes=COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compress(self, body, coding):
+        """Return a body compressed with a coding, from the cache when possible."""
+        key = (coding, hashlib.blake2b(body, digest_size=16).digest())
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+        compressed = compress(body, coding)
+        with self._lock:
+            if key not in self._entries and len(compressed) <= self.max_bytes:
+                self._entries[key] = compressed
+                self.size += len(compressed)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return compressed
+
+    def clear(self):
+        """Drop every cached body."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+def _is_cacheable(headers):
+    cache_control = headers.get('cache-control', '').lower()
+    return bool(cache_control) and 'no-store' not in cache_control and 'private' not in cache_control
+
+
+def _vary_on_accept_encoding(headers):
+    vary = headers.get('vary', '')
+    if 'accept-encoding' not in {token.strip().lower() for token in vary.split(',')}:
+        headers['vary'] = f'{vary}, Accept-Encoding' if vary.strip() else 'Accept-Encoding'
+
+
+def _weaken_etag(headers):
+    etag = headers.get('etag')
+    if etag and not etag.startswith('W/'):
+        headers['etag'] = 'W/' + etag
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses, see the module docstring.
+
+    Args:
+        app: ASGI application
+        minimum_size: Smallest body compressed, in bytes
+        cache: CompressedBodyCache for cacheable responses
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE, cache=compressed_bodies):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        coding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+            candidate = (
+                headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+                and 'content-encoding' not in headers
+            )
+            # Routes encoding their own bodies (the exports) vary too
+            if candidate or 'content-encoding' in headers or start['status'] == 304:
+                _vary_on_accept_encoding(headers)
+
+            # Streamed bodies are sent as they come
+            if message.get('more_body', False):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if coding and start['status'] == 304:
+                _weaken_etag(headers)
+            elif coding and candidate and start['status'] == 200 and len(body) >= self.minimum_size:
+                if self.cache is not None and _is_cacheable(headers):
+                    body = self.cache.compress(body, coding)
+                else:
+                    body = compress(body, coding)
+                headers['content-encoding'] = coding
+                headers['content-length'] = str(len(body))
+                _weaken_etag(headers)
+                message = {**message, 'body': body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
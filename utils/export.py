@@ -0,0 +1,123 @@
+"""Streaming exports of procurement notices as CSV or JSON Lines.
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_ROWS
+and written out batch by batch, so an export of the whole table needs no
+more memory than one batch. Rows come in (updated_at, id) order: a client
+pulling incrementally passes the largest updated_at it has seen as since=
+on its next pull (rows updated at exactly that instant are sent again).
+Batches are formatted and compressed in worker threads, so long exports
+do not hold up the event loop serving the pages.
+"""
+import asyncio
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from .database import async_session, ProcurementNotice
+from .ingestion import NOTICE_COLUMNS, parse_datetime
+
+# Columns of an exported notice, in order
+EXPORT_COLUMNS = ('id',) + NOTICE_COLUMNS + ('organization_id', 'created_at', 'updated_at')
+
+# Rows fetched from the server-side cursor at a time
+EXPORT_BATCH_ROWS = 2000
+
+# Exports streaming at once, each holding a pooled connection until it ends
+EXPORT_CONCURRENCY = 2
+
+# Content type of each export format
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+_exports = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+
+def parse_since(value):
+    """Parse a since= parameter (ISO 8601 date or datetime) as naive UTC.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 date or datetime
+    """
+    # Same parsing as the feed's dates, including a trailing 'Z'
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f"Invalid since value: {value!r}")
+    return since
+
+
+def export_statement(statement, since=None):
+    """Select the export columns of a filtered ProcurementNotice select.
+
+    Args:
+        statement: select() over ProcurementNotice with the list filters applied
+        since: Only notices updated at or after this datetime
+    """
+    statement = statement.with_only_columns(
+        *(getattr(ProcurementNotice, column) for column in EXPORT_COLUMNS)
+    )
+    if since is not None:
+        statement = statement.filter(ProcurementNotice.updated_at >= since)
+    return statement.order_by(ProcurementNotice.updated_at, ProcurementNotice.id)
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def format_csv(rows, header=False):
+    """Format rows of EXPORT_COLUMNS as CSV text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+    )
+    return buffer.getvalue()
+
+
+def format_jsonl(rows):
+    """Format rows of EXPORT_COLUMNS as JSON Lines text."""
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, map(_json_value, row))), ensure_ascii=False) + '\n' for row in rows
+    )
+
+
+def _encode_batch(rows, fmt):
+    return (format_csv(rows) if fmt == 'csv' else format_jsonl(rows)).encode()
+
+
+async def stream_export(statement, fmt):
+    """Yield an export of a statement from export_statement() in chunks.
+
+    Args:
+        statement: Statement from export_statement()
+        fmt: 'csv' or 'jsonl'
+
+    Yields:
+        bytes: UTF-8 encoded chunks, one per batch of rows
+    """
+    async with _exports, async_session() as db:
+        if fmt == 'csv':
+            yield format_csv((), header=True).encode()
+        result = await db.stream(statement.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        async for rows in result.partitions():
+            yield await asyncio.to_thread(_encode_batch, rows, fmt)
+
+
+async def gzip_chunks(chunks):
+    """Compress an async stream of byte chunks into one gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = await asyncio.to_thread(compressor.compress, chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
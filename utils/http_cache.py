@@ -0,0 +1,88 @@
+"""HTTP validators and cache headers for rendered pages.
+
+Pages carry an ETag (and Last-Modified where a row's updated_at is known)
+so browsers and the CDN revalidate with If-None-Match / If-Modified-Since
+and get an empty 304 when nothing changed. Detail pages use strong ETags
+from the notice's updated_at; list and analytics pages use weak ETags from
+the sync generation (see utils/response_cache.py), as their content only
+changes when a sync succeeds. Shared caches may serve a page for
+PAGE_SHARED_MAX_AGE seconds without asking; browsers always revalidate.
+"""
+import os
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+# Seconds a shared cache (CDN) may serve a page without revalidating it
+PAGE_SHARED_MAX_AGE = int(os.getenv('PAGE_SHARED_MAX_AGE', '300'))
+
+
+def http_date(moment):
+    """Format a naive UTC datetime as an HTTP date."""
+    return format_datetime(moment.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def page_etag(req, *parts, weak=False):
+    """Build an ETag from version parts of a page.
+
+    htmx requests get the page without its <html> wrapper (FastHTML varies
+    on HX-Request), so they get a different tag.
+
+    Args:
+        req: Starlette request
+        *parts: Values identifying this version of the page
+        weak: Build a weak validator (same content, not byte-identical)
+    """
+    if req.headers.get('hx-request'):
+        parts += ('hx',)
+    tag = '"' + '-'.join(str(part) for part in parts) + '"'
+    return 'W/' + tag if weak else tag
+
+
+def _opaque_tag(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def is_not_modified(req, etag, last_modified=None):
+    """Return True if the request's validators match the current version.
+
+    If-None-Match wins over If-Modified-Since, and is compared weakly
+    (as GET requests are).
+
+    Args:
+        req: Starlette request
+        etag: Current ETag of the page
+        last_modified: Naive UTC datetime the page last changed, if known
+    """
+    if_none_match = req.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(',')}
+
+    if_modified_since = req.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def cache_headers(etag, last_modified=None):
+    """Return the validator and Cache-Control headers of a page.
+
+    Args:
+        etag: ETag of the page
+        last_modified: Naive UTC datetime the page last changed, if known
+    """
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age=0, must-revalidate, s-maxage={PAGE_SHARED_MAX_AGE}',
+    }
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
@@ -1,11 +1,289 @@
 """Data ingestion utilities for Latvia procurement notices."""
+import codecs
+import hashlib
+import json
+import os
+import random
+import re
 import requests
 import logging
-from datetime import datetime, timedelta
-from .database import SessionLocal, ProcurementNotice, DataSyncLog
+import time
+from contextlib import ExitStack, nullcontext
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from .database import SessionLocal, NoticeIdentifier, ProcurementNotice, DataSyncLog, SyncState
+from .metrics import track_sync_queries
+from .organizations import resolve_organizations
+from .partitions import ensure_notice_partitions
+from .payload_cache import payload_cache
+from .response_cache import refresh_response_cache
+from .rollups import ROLLUP_DIMENSIONS, add_delta, apply_deltas, rollup_key
 
 logger = logging.getLogger(__name__)
 
+# Base URL of the daily notice files (overridable for local mirrors and stubs)
+IUB_BASE_URL = os.getenv('IUB_BASE_URL', 'https://open.iub.gov.lv/data/notice')
+
+# Number of notices written per INSERT ... ON CONFLICT statement in bulk mode,
+# and per committed batch in stream mode
+UPSERT_CHUNK_SIZE = 500
+
+# Column order of the compact row tuples built by normalize_payload
+NOTICE_COLUMNS = (
+    'identifier', 'country_code', 'name', 'description', 'notice_type',
+    'procedure_type', 'main_nature_type', 'cpv_type', 'cpv_division', 'estimated_value',
+    'estimated_amount', 'currency', 'organization_name', 'organization_city',
+    'organization_identifier', 'contact_name', 'contact_email',
+    'contact_telephone', 'public_opening_date', 'deadline_receipt_tenders_date',
+    'documents_url', 'submission_url', 'content_hash',
+)
+
+# Columns computed from other columns; left out of the content fingerprint
+DERIVED_COLUMNS = ('cpv_division', 'estimated_amount', 'content_hash')
+
+# Estimated values that count as amounts (matches migration 0002_estimated_amount)
+AMOUNT_PATTERN = re.compile(r'^\d+\.?\d*$')
+
+# Bytes read from the response body at a time in stream mode
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Retry policy for transient fetch failures (connection errors, 429, 5xx)
+IUB_MAX_RETRIES = int(os.getenv('IUB_MAX_RETRIES', '4'))
+IUB_BACKOFF_BASE = float(os.getenv('IUB_BACKOFF_BASE', '0.5'))
+IUB_BACKOFF_MAX = float(os.getenv('IUB_BACKOFF_MAX', '30'))
+
+
+class FetchError(Exception):
+    """A daily file could not be fetched because of a transient or server failure.
+    
+    Distinct from a 404, which means the file is not published (yet).
+    """
+
+
+class IUBClient:
+    """HTTP client for the open data API.
+    
+    Keeps one requests.Session with a connection pool so consecutive and
+    concurrent fetches reuse keep-alive connections. Connection errors,
+    timeouts, 429 and 5xx responses are retried with exponential backoff
+    and full jitter, honoring Retry-After when the server sends it.
+    
+    Args:
+        max_retries: Retries after the first attempt
+        backoff_base: Upper bound of the first backoff delay in seconds
+        backoff_max: Upper bound of any computed backoff delay in seconds
+        timeout: Connect/read timeout per attempt in seconds
+        pool_size: Maximum pooled connections per host
+    """
+    
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    RETRY_AFTER_MAX = 300  # Never sleep longer than this on a server's request
+    
+    def __init__(self, max_retries=IUB_MAX_RETRIES, backoff_base=IUB_BACKOFF_BASE,
+                 backoff_max=IUB_BACKOFF_MAX, timeout=30, pool_size=16):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+    
+    def backoff_delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number ``attempt`` (0-based)."""
+        if retry_after is not None:
+            return min(retry_after, self.RETRY_AFTER_MAX)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+    
+    @staticmethod
+    def parse_retry_after(value):
+        """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    
+    def get(self, url, headers=None, stream=True, throttle=None):
+        """GET a daily file.
+        
+        Args:
+            url: File URL
+            headers: Extra request headers
+            stream: Leave the body unread until the caller iterates it
+            throttle: Called before every attempt, retries included (e.g.
+                SyncLimits.throttle to take a rate limit token)
+        
+        Returns:
+            requests.Response for 2xx and 304 responses, or None for a 404
+        
+        Raises:
+            FetchError: after the retries are exhausted, or immediately on
+                other non-retryable HTTP errors
+        """
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            if throttle:
+                throttle()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = str(e)
+            else:
+                if response.status_code < 400:
+                    return response
+                # Reading the (small) error body releases the connection back to the pool
+                response.content
+                if response.status_code == 404:
+                    return None
+                if response.status_code not in self.RETRY_STATUSES:
+                    raise FetchError(f"HTTP {response.status_code} for {url}")
+                error = f"HTTP {response.status_code}"
+                retry_after = self.parse_retry_after(response.headers.get('Retry-After'))
+            
+            if attempt == self.max_retries:
+                break
+            delay = self.backoff_delay(attempt, retry_after)
+            logger.warning(f"Fetching {url} failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+        
+        raise FetchError(f"Giving up on {url} after {self.max_retries + 1} attempts: {error}")
+
+
+# Shared by all fetches so backfills reuse pooled connections
+http_client = IUBClient()
+
+
+def notice_date_str(target_date):
+    """Format a date as the YYYY/MM/DD-MM-YYYY path used by the open data API."""
+    day = target_date.strftime('%d')
+    month = target_date.strftime('%m')
+    year = target_date.strftime('%Y')
+    return f"{year}/{month}/{day}-{month}-{year}"
+
+
+def notice_url(date_str):
+    """Return the URL of the daily notice file for a YYYY/MM/DD-MM-YYYY date string."""
+    return f"{IUB_BASE_URL}/{date_str}.json"
+
+
+class Payload:
+    """A daily notice file, read either from the payload cache or a live response.
+    
+    Attributes:
+        date_str: Date string the payload belongs to
+        sha256: Content hash of the body; for live responses it is known
+            once the body has been read completely
+        not_modified: True when the server answered 304 (or an identical
+            body) for a file that was already ingested
+    """
+    
+    def __init__(self, date_str, path=None, response=None, sha256=None, not_modified=False):
+        self.date_str = date_str
+        self.path = path
+        self.response = response
+        self.sha256 = sha256
+        self.not_modified = not_modified
+    
+    def iter_chunks(self):
+        """Yield the raw body in STREAM_CHUNK_SIZE pieces."""
+        if self.path:
+            with open(self.path, 'rb') as f:
+                while True:
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+        else:
+            digest = hashlib.sha256()
+            with self.response:
+                for chunk in self.response.iter_content(STREAM_CHUNK_SIZE):
+                    digest.update(chunk)
+                    yield chunk
+            self.sha256 = digest.hexdigest()
+    
+    def notices(self):
+        """Yield notices one at a time without loading the whole file."""
+        return iter_json_array(self.iter_chunks())
+    
+    def load(self):
+        """Parse the whole file into a list of notices."""
+        return json.loads(b''.join(self.iter_chunks()))
+
+
+def fetch_payload(date_str, offline=False, throttle=None):
+    """Fetch the raw daily file, going through the on-disk payload cache.
+    
+    When the date is cached, the request carries If-None-Match and
+    If-Modified-Since; a 304 for an already ingested file returns a payload
+    with ``not_modified`` set so callers can skip parsing and DB work.
+    
+    Args:
+        date_str: Date string in format YYYY/MM/DD-MM-YYYY
+        offline: Serve only from the cache, never touching the network
+        throttle: Called before every HTTP attempt (see IUBClient.get)
+    
+    Returns:
+        Payload, or None if no data is available
+    
+    Raises:
+        FetchError: if the file could not be fetched (not a missing day)
+    """
+    entry = payload_cache.get(date_str) if payload_cache else None
+    
+    if offline:
+        if entry is None:
+            logger.warning(f"No cached payload for {date_str}")
+            return None
+        return Payload(date_str, path=payload_cache.blob_path(entry['sha256']), sha256=entry['sha256'])
+    
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    
+    url = notice_url(date_str)
+    logger.info(f"Fetching data from: {url}")
+    response = http_client.get(url, headers=headers, throttle=throttle)
+    if response is None:
+        logger.warning(f"No data available for {date_str} (404)")
+        return None
+    
+    if response.status_code == 304 and entry:
+        response.content
+        logger.info(f"{date_str} not modified since last fetch")
+        return Payload(date_str, path=payload_cache.blob_path(entry['sha256']),
+                       sha256=entry['sha256'], not_modified=entry.get('ingested', False))
+    
+    if payload_cache is None:
+        return Payload(date_str, response=response)
+    
+    try:
+        with response:
+            stored = payload_cache.store(
+                date_str,
+                response.iter_content(STREAM_CHUNK_SIZE),
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+    except requests.exceptions.RequestException as e:
+        raise FetchError(f"Error downloading {url}: {e}") from e
+    return Payload(date_str, path=payload_cache.blob_path(stored['sha256']),
+                   sha256=stored['sha256'], not_modified=stored['ingested'])
+
 
 def fetch_procurement_data(date_str):
     """Fetch procurement data from Latvia open data API.
@@ -16,54 +294,145 @@ def fetch_procurement_data(date_str):
     Returns:
         List of procurement notices or None if error
     """
-    url = f"https://open.iub.gov.lv/data/notice/{date_str}.json"
     try:
-        logger.info(f"Fetching data from: {url}")
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        logger.info(f"Successfully fetched {len(data)} records")
-        return data
-    except requests.exceptions.HTTPError as e:
-        if e.response.status_code == 404:
-            logger.warning(f"No data available for {date_str} (404)")
-        else:
-            logger.error(f"HTTP error fetching data: {e}")
+        payload = fetch_payload(date_str)
+    except FetchError as e:
+        logger.error(f"Error fetching data: {e}")
         return None
-    except requests.exceptions.RequestException as e:
+    if payload is None:
+        return None
+    try:
+        data = payload.load()
+    except (ValueError, OSError, requests.exceptions.RequestException) as e:
+        logger.error(f"Error reading data for {date_str}: {e}")
+        return None
+    logger.info(f"Successfully fetched {len(data)} records")
+    return data
+
+
+def stream_procurement_data(date_str):
+    """Fetch procurement data without loading the whole file into memory.
+    
+    Args:
+        date_str: Date string in format YYYY/MM/DD-MM-YYYY
+    
+    Returns:
+        Generator yielding procurement notices one at a time, or None if error
+    """
+    try:
+        payload = fetch_payload(date_str)
+    except FetchError as e:
         logger.error(f"Error fetching data: {e}")
         return None
+    return payload.notices() if payload else None
+
+
+def iter_json_array(chunks):
+    """Incrementally parse a top-level JSON array.
+    
+    Only the current element and at most one unread chunk are held in
+    memory, regardless of the size of the document.
+    
+    Args:
+        chunks: Iterable of UTF-8 encoded byte chunks
+    
+    Yields:
+        Decoded array elements in document order
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    
+    while True:
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char in ' \t\r\n':
+                pos += 1
+            elif not started:
+                if char != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+            elif char == ',':
+                pos += 1
+            elif char == ']':
+                return
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break  # Element continues in the next chunk
+                if (char not in '{["' and not eof
+                        and (end == len(buffer) or buffer[end] not in ' \t\r\n,]')):
+                    break  # A bare number may be cut off mid-digits
+                yield item
+                pos = end
+        
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(chunk)
+        pos = 0
 
 
 def parse_datetime(date_str):
-    """Parse datetime string from API."""
+    """Parse datetime string from API into a naive UTC datetime."""
     if not date_str:
         return None
     try:
-        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        parsed = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
     except Exception as e:
         logger.debug(f"Error parsing datetime '{date_str}': {e}")
         return None
+    # Stored as naive UTC like every timestamp column, whichever path
+    # (ORM, bulk upsert or COPY) writes it
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 
-def ingest_notice(db, notice_data):
-    """Ingest a single procurement notice into database.
+def parse_amount(value):
+    """Parse an API estimatedValue into a Decimal.
+    
+    Args:
+        value: Raw estimatedValue (number, string or None)
+    
+    Returns:
+        Decimal: Parsed amount, or None if the value is missing or not a
+        plain non-negative number
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    text = str(value).strip()
+    if not AMOUNT_PATTERN.match(text):
+        return None
+    return Decimal(text)
+
+
+def normalize_notice(notice_data):
+    """Map a raw API notice onto ProcurementNotice column values.
     
     Args:
-        db: Database session
         notice_data: Dictionary containing notice data
     
     Returns:
-        tuple: (was_added, was_updated)
+        dict: Column values keyed by attribute name, including
+        content_hash, or None if the notice has no identifier
     """
     identifier = notice_data.get('identifier')
     if not identifier:
-        return False, False
-    
-    # Check if notice already exists
-    existing = db.query(ProcurementNotice).filter(
-        ProcurementNotice.identifier == identifier
-    ).first()
+        return None
     
     notice_dict = {
         'identifier': identifier,
@@ -74,7 +443,9 @@ def ingest_notice(db, notice_data):
         'procedure_type': notice_data.get('procedureType'),
         'main_nature_type': notice_data.get('mainNatureType'),
         'cpv_type': notice_data.get('cpvType'),
+        'cpv_division': (notice_data.get('cpvType') or '')[:2] or None,
         'estimated_value': str(notice_data.get('estimatedValue', '')),
+        'estimated_amount': parse_amount(notice_data.get('estimatedValue')),
         'currency': notice_data.get('currency'),
         'organization_name': notice_data.get('organizationName'),
         'organization_city': notice_data.get('organizationCity'),
@@ -87,49 +458,420 @@ def ingest_notice(db, notice_data):
         'documents_url': notice_data.get('documentsURL'),
         'submission_url': notice_data.get('submissionURL'),
     }
+    notice_dict['content_hash'] = notice_fingerprint(notice_dict)
+    return notice_dict
+
+
+def notice_fingerprint(notice_dict):
+    """Return a stable SHA-256 over a normalized notice's column values.
+    
+    Two payloads with the same fingerprint would write identical rows, so
+    ingest can skip them instead of rewriting the row.
+    """
+    canonical = json.dumps(
+        {key: value for key, value in notice_dict.items() if key not in DERIVED_COLUMNS},
+        sort_keys=True,
+        default=lambda value: value.isoformat(),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def ingest_notice(db, notice_data, rollup_deltas=None, created_at=None):
+    """Ingest a single procurement notice into database.
+    
+    Args:
+        db: Database session
+        notice_data: Dictionary containing notice data
+        rollup_deltas: Dictionary to collect analytics rollup changes in
+            (see utils.rollups.add_delta); applied immediately when omitted
+        created_at: created_at (and so partition) of notices not stored
+            yet, the publication date of their daily file (default: now)
     
+    Returns:
+        tuple: (was_added, was_updated, was_unchanged)
+    """
+    notice_dict = normalize_notice(notice_data)
+    if notice_dict is None:
+        return False, False, False
+    
+    # Register the identifier if it is new; the registry locates its
+    # partition. The stored row is locked, so a concurrent writer cannot
+    # change it between the comparison and the rollup adjustment below.
+    identifier = notice_dict['identifier']
+    created_at = register_identifiers(db, [identifier], created_at or datetime.utcnow())[identifier]
+    existing = db.query(ProcurementNotice).filter(
+        ProcurementNotice.identifier == identifier,
+        ProcurementNotice.created_at == created_at
+    ).with_for_update().populate_existing().first()
+    
+    if existing and existing.content_hash == notice_dict['content_hash']:
+        return False, False, True  # Nothing changed, leave the row alone
+    
+    resolve_organizations(db, [notice_dict])
+    deltas = {} if rollup_deltas is None else rollup_deltas
     if existing:
         # Update existing record
+        if existing.created_at:
+            day = existing.created_at.date()
+            add_delta(deltas, rollup_key(day, existing), existing.estimated_amount, -1)
+            add_delta(deltas, rollup_key(day, notice_dict), notice_dict['estimated_amount'])
         for key, value in notice_dict.items():
             setattr(existing, key, value)
         existing.updated_at = datetime.utcnow()
-        return False, True  # Not added, but updated
+        result = False, True, False  # Not added, but updated
     else:
         # Create new record
-        new_notice = ProcurementNotice(**notice_dict)
+        new_notice = ProcurementNotice(**notice_dict, created_at=created_at)
+        add_delta(deltas, rollup_key(new_notice.created_at.date(), notice_dict), notice_dict['estimated_amount'])
         db.add(new_notice)
-        return True, False  # Added, not updated
+        result = True, False, False  # Added, not updated
+    
+    if rollup_deltas is None:
+        apply_deltas(db, deltas)
+    return result
 
 
-def sync_date(target_date):
+def _upsert_statement(db):
+    """Build an INSERT ... ON CONFLICT (identifier, created_at) DO UPDATE for the session's dialect."""
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        insert = postgresql.insert
+    elif dialect == 'sqlite':
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported on {dialect}")
+    
+    table = ProcurementNotice.__table__
+    stmt = insert(table)
+    # created_at keeps its original value; everything else follows the feed
+    update_columns = {
+        column.name: stmt.excluded[column.name]
+        for column in table.columns
+        if column.name not in ('id', 'identifier', 'created_at')
+    }
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.identifier, table.c.created_at],
+        set_=update_columns,
+        # Guards against a concurrent writer having stored the same content
+        where=table.c.content_hash.is_distinct_from(stmt.excluded.content_hash)
+    )
+
+
+def register_identifiers(db, identifiers, created_at):
+    """Register new notice identifiers and return every identifier's created_at.
+    
+    Identifiers claimed concurrently by another writer keep that writer's
+    created_at; claiming one waits for the other writer's transaction, so
+    its notice row is visible afterwards.
+    
+    Args:
+        db: Database session
+        identifiers: Notice identifiers
+        created_at: created_at for identifiers not registered yet
+    
+    Returns:
+        dict: created_at by identifier
+    """
+    registered = dict(db.execute(
+        select(NoticeIdentifier.identifier, NoticeIdentifier.created_at).where(
+            NoticeIdentifier.identifier.in_(list(identifiers))
+        )
+    ).all())
+    new_identifiers = sorted(identifier for identifier in identifiers if identifier not in registered)
+    if new_identifiers:
+        insert = postgresql.insert if db.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        claimed = set(db.execute(
+            insert(NoticeIdentifier).on_conflict_do_nothing().returning(NoticeIdentifier.identifier),
+            [{'identifier': identifier, 'created_at': created_at} for identifier in new_identifiers]
+        ).scalars())
+        registered.update((identifier, created_at) for identifier in claimed)
+        lost = [identifier for identifier in new_identifiers if identifier not in claimed]
+        if lost:
+            # Registered by a concurrent writer since the lookup above
+            registered.update(db.execute(
+                select(NoticeIdentifier.identifier, NoticeIdentifier.created_at).where(
+                    NoticeIdentifier.identifier.in_(lost)
+                )
+            ).all())
+    return registered
+
+
+def upsert_notices(db, rows, created_at=None):
+    """Write a chunk of normalized notices with a single upsert statement.
+    
+    New identifiers are registered in NoticeIdentifier first, which keeps
+    them unique across partitions and fixes their created_at. Stored
+    fingerprints are looked up with one IN query beforehand. Rows
+    whose fingerprint matches are not written at all, so unchanged notices
+    keep their updated_at and cause no index or WAL churn. The same query
+    returns the stored rollup dimensions, so the analytics rollups are
+    adjusted in the same transaction. It locks the stored rows (in
+    identifier order, like every writer), so concurrent backfill workers
+    writing the same notice do not both subtract its old rollup cell.
+    
+    Args:
+        db: Database session
+        rows: List of dictionaries produced by normalize_notice
+        created_at: created_at (and so partition) of notices not stored
+            yet, the publication date of their daily file (default: now)
+    
+    Returns:
+        tuple: (records_added, records_updated, records_unchanged)
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement,
+    # so keep only the last occurrence of each identifier
+    by_identifier = {row['identifier']: row for row in rows}
+    if not by_identifier:
+        return 0, 0, 0
+    
+    now = datetime.utcnow()
+    registered = register_identifiers(db, by_identifier, created_at or now)
+    
+    # created_at is part of the filter so PostgreSQL only reads the
+    # partitions these notices live in. Locking makes concurrent writers
+    # wait here and then read the version they committed.
+    stored = {
+        stored_row.identifier: stored_row
+        for stored_row in db.execute(
+            select(
+                ProcurementNotice.identifier,
+                ProcurementNotice.content_hash,
+                ProcurementNotice.created_at,
+                ProcurementNotice.estimated_amount,
+                *(getattr(ProcurementNotice, column) for column in ROLLUP_DIMENSIONS)
+            ).where(
+                ProcurementNotice.identifier.in_(list(by_identifier)),
+                ProcurementNotice.created_at.in_(set(registered.values()))
+            ).order_by(ProcurementNotice.identifier).with_for_update()
+        )
+    }
+    
+    changed = []
+    records_added = records_updated = records_unchanged = 0
+    # Sorted so the upsert writes rows in the order they were locked
+    for identifier, row in sorted(by_identifier.items()):
+        previous = stored.get(identifier)
+        if previous is None:
+            records_added += 1
+        elif previous.content_hash != row['content_hash']:
+            records_updated += 1
+        else:
+            records_unchanged += 1
+            continue
+        changed.append((dict(row, created_at=registered[identifier], updated_at=now), previous))
+    
+    if changed:
+        resolve_organizations(db, [row for row, _ in changed])
+        deltas = {}
+        for row, previous in changed:
+            if previous is None:
+                add_delta(deltas, rollup_key(row['created_at'].date(), row), row['estimated_amount'])
+            else:
+                day = previous.created_at.date()
+                add_delta(deltas, rollup_key(day, previous), previous.estimated_amount, -1)
+                add_delta(deltas, rollup_key(day, row), row['estimated_amount'])
+        db.execute(_upsert_statement(db), [row for row, _ in changed])
+        apply_deltas(db, deltas)
+    
+    return records_added, records_updated, records_unchanged
+
+
+def ingest_notices_bulk(db, notices, chunk_size=UPSERT_CHUNK_SIZE, commit_chunks=False, created_at=None):
+    """Normalize notices and write them in chunked upserts.
+    
+    Args:
+        db: Database session
+        notices: Iterable of raw notice dictionaries (a list or a generator)
+        chunk_size: Number of notices per upsert statement
+        commit_chunks: Commit after every chunk, so peak memory is bounded
+            by chunk_size rather than by the size of the day
+        created_at: created_at (and so partition) of notices not stored
+            yet, the publication date of their daily file (default: now)
+    
+    Returns:
+        tuple: (records_processed, records_added, records_updated, records_unchanged)
+    """
+    records_processed = 0
+    records_added = 0
+    records_updated = 0
+    records_unchanged = 0
+    chunk = []
+    
+    def flush():
+        nonlocal records_added, records_updated, records_unchanged
+        added, updated, unchanged = upsert_notices(db, chunk, created_at)
+        records_added += added
+        records_updated += updated
+        records_unchanged += unchanged
+        if commit_chunks:
+            db.commit()
+    
+    for notice_data in notices:
+        records_processed += 1
+        try:
+            row = normalize_notice(notice_data)
+        except Exception as e:
+            logger.error(f"Error processing notice: {e}")
+            continue
+        if row is None:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+            chunk = []
+    
+    if chunk:
+        flush()
+    
+    return records_processed, records_added, records_updated, records_unchanged
+
+
+def normalize_payload(path=None, body=None):
+    """Parse and normalize a whole daily file into compact row tuples.
+    
+    This is the CPU-bound stage of the pipelined import and runs in a worker
+    process, so it only takes and returns picklable values.
+    
+    Args:
+        path: Path of the raw file (e.g. in the payload cache)
+        body: Raw file contents, when the file is not on disk
+    
+    Returns:
+        tuple: (records_processed, rows in NOTICE_COLUMNS order, cpu_seconds)
+    """
+    started = time.process_time()
+    if path:
+        with open(path, 'rb') as f:
+            body = f.read()
+    notices = json.loads(body)
+    rows = []
+    for notice_data in notices:
+        try:
+            row = normalize_notice(notice_data)
+        except Exception as e:
+            logger.error(f"Error processing notice: {e}")
+            continue
+        if row is not None:
+            rows.append(tuple(row[column] for column in NOTICE_COLUMNS))
+    return len(notices), rows, time.process_time() - started
+
+
+def ingest_rows(db, rows, chunk_size=UPSERT_CHUNK_SIZE, created_at=None):
+    """Write row tuples from normalize_payload in chunked upserts.
+    
+    Args:
+        db: Database session
+        rows: List of tuples in NOTICE_COLUMNS order
+        chunk_size: Number of rows per upsert statement
+        created_at: created_at (and so partition) of notices not stored
+            yet, the publication date of their daily file (default: now)
+    
+    Returns:
+        tuple: (records_added, records_updated, records_unchanged)
+    """
+    records_added = records_updated = records_unchanged = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = [dict(zip(NOTICE_COLUMNS, row)) for row in rows[start:start + chunk_size]]
+        added, updated, unchanged = upsert_notices(db, chunk, created_at)
+        records_added += added
+        records_updated += updated
+        records_unchanged += unchanged
+    return records_added, records_updated, records_unchanged
+
+
+def record_sync_state(db, publication_date, **fields):
+    """Create or update the SyncState row for a publication date.
+    
+    Args:
+        db: Database session (the caller commits)
+        publication_date: date the daily file belongs to
+        **fields: SyncState column values to set
+    
+    Returns:
+        SyncState: The updated row
+    """
+    state = db.get(SyncState, publication_date)
+    if state is None:
+        state = SyncState(publication_date=publication_date, attempts=0)
+        db.add(state)
+    for key, value in fields.items():
+        setattr(state, key, value)
+    return state
+
+
+@track_sync_queries
+def sync_date(target_date, mode='bulk', limits=None, offline=False, normalize_pool=None, warm_cache=True):
     """Sync procurement data for a specific date.
     
     Args:
         target_date: datetime object for the date to sync
+        mode: 'bulk' writes the day in chunked INSERT ... ON CONFLICT
+            statements, 'stream' parses the response incrementally and
+            commits every chunk, 'pipeline' parses and normalizes in
+            normalize_pool and only writes in this thread, 'row' uses the
+            per-notice ORM path
+        limits: Optional SyncLimits shared with concurrent backfill workers
+        offline: Replay the day from the payload cache without network access
+        normalize_pool: concurrent.futures.ProcessPoolExecutor for 'pipeline'
+        warm_cache: Re-render the cached analytics after a successful sync
+            (callers syncing many days do it once at the end instead)
         
     Returns:
         dict: Sync results with status and counts
     """
     db = SessionLocal()
     
-    day = target_date.strftime('%d')
-    month = target_date.strftime('%m')
-    year = target_date.strftime('%Y')
-    date_str = f"{year}/{month}/{day}-{month}-{year}"
+    date_str = notice_date_str(target_date)
     
     logger.info(f"Starting sync for {date_str}")
     
-    # Create sync log entry
-    sync_log = DataSyncLog(status='in_progress')
-    db.add(sync_log)
-    db.commit()
+    fetching = limits.fetching if limits else nullcontext
+    throttle = limits.throttle if limits else None
+    writing = limits.writing if limits else nullcontext
+    
+    publication_date = target_date.date() if isinstance(target_date, datetime) else target_date
+    # New notices are stored (and partitioned) by the day they were published
+    published_at = datetime(publication_date.year, publication_date.month, publication_date.day)
+    started_at = datetime.utcnow()
+    
+    def finish_state(status, **fields):
+        finished_at = datetime.utcnow()
+        record_sync_state(
+            db, publication_date, status=status, finished_at=finished_at,
+            duration_seconds=(finished_at - started_at).total_seconds(), **fields
+        )
+    
+    # Create sync log entry and mark the date as in progress
+    with writing():
+        sync_log = DataSyncLog(status='in_progress')
+        db.add(sync_log)
+        state = record_sync_state(
+            db, publication_date, status='in_progress', started_at=started_at,
+            finished_at=None, duration_seconds=None, error_message=None
+        )
+        state.attempts = (state.attempts or 0) + 1
+        db.commit()
+    
+    timings = {}
+    # Stream mode commits every chunk, so a failure can leave notices written
+    partial_writes = False
+    # Held until the body has been read: right after the fetch when it went
+    # to the payload cache, after parsing when it is a live response
+    fetch_slot = ExitStack()
     
     try:
-        data = fetch_procurement_data(date_str)
+        stage_started = time.monotonic()
+        fetch_slot.enter_context(fetching())
+        payload = fetch_payload(date_str, offline=offline, throttle=throttle)
+        if payload is None or payload.path:
+            fetch_slot.close()
+        timings['fetch_seconds'] = time.monotonic() - stage_started
         
-        if data is None:
+        if payload is None:
             sync_log.status = 'failed'
             sync_log.error_message = f'No data available for {date_str}'
+            finish_state('missing', error_message='Not published (404)')
             db.commit()
             db.close()
             return {
@@ -138,51 +880,125 @@ def sync_date(target_date):
                 'error': 'No data available'
             }
         
+        if payload.not_modified:
+            # Same file as the last successful ingest: no parsing, no writes
+            sync_log.status = 'not_modified'
+            finish_state('success', payload_hash=payload.sha256)
+            db.commit()
+            logger.info(f"⏭️  {date_str} unchanged since last sync, skipping")
+            return {
+                'status': 'success',
+                'date': date_str,
+                'not_modified': True,
+                'processed': 0,
+                'added': 0,
+                'updated': 0,
+                'unchanged': 0
+            }
+        
         records_added = 0
         records_updated = 0
-        records_processed = len(data)
+        records_unchanged = 0
+        records_processed = 0
         
-        for notice_data in data:
-            try:
-                added, updated = ingest_notice(db, notice_data)
-                if added:
-                    records_added += 1
-                elif updated:
-                    records_updated += 1
-            except Exception as e:
-                logger.error(f"Error processing notice: {e}")
-                continue
+        if mode == 'pipeline':
+            source = {'path': payload.path} if payload.path else {'body': b''.join(payload.iter_chunks())}
+            fetch_slot.close()
+            records_processed, rows, timings['normalize_seconds'] = normalize_pool.submit(
+                normalize_payload, **source
+            ).result()
+        elif mode == 'stream':
+            data = payload.notices()
+        else:
+            data = payload.load()
+            fetch_slot.close()
         
-        db.commit()
+        with writing():
+            stage_started = time.monotonic()
+            partial_writes = mode == 'stream'
+            ensure_notice_partitions(db.get_bind(), published_at)
+            if mode == 'pipeline':
+                records_added, records_updated, records_unchanged = ingest_rows(db, rows, created_at=published_at)
+            elif mode in ('bulk', 'stream'):
+                records_processed, records_added, records_updated, records_unchanged = ingest_notices_bulk(
+                    db, data, commit_chunks=(mode == 'stream'), created_at=published_at
+                )
+            else:
+                records_processed = len(data)
+                rollup_deltas = {}
+                # In identifier order (stable, so the last copy of a notice
+                # still wins) to lock rows in the order the bulk path does
+                for notice_data in sorted(data, key=lambda notice: str(notice.get('identifier') or '')):
+                    try:
+                        added, updated, unchanged = ingest_notice(db, notice_data, rollup_deltas, published_at)
+                        if added:
+                            records_added += 1
+                        elif updated:
+                            records_updated += 1
+                        elif unchanged:
+                            records_unchanged += 1
+                    except Exception as e:
+                        logger.error(f"Error processing notice: {e}")
+                        continue
+                apply_deltas(db, rollup_deltas)
+            
+            db.commit()
+            
+            # Update sync log
+            sync_log.status = 'success'
+            sync_log.records_processed = records_processed
+            sync_log.records_added = records_added
+            sync_log.records_updated = records_updated
+            sync_log.records_unchanged = records_unchanged
+            finish_state(
+                'success',
+                records_processed=records_processed,
+                records_added=records_added,
+                records_updated=records_updated,
+                records_unchanged=records_unchanged,
+                payload_hash=payload.sha256
+            )
+            db.commit()
         
-        # Update sync log
-        sync_log.status = 'success'
-        sync_log.records_processed = records_processed
-        sync_log.records_added = records_added
-        sync_log.records_updated = records_updated
-        db.commit()
+        timings['write_seconds'] = time.monotonic() - stage_started
+        
+        if payload_cache and payload.sha256:
+            payload_cache.mark_ingested(date_str, payload.sha256)
+        
+        if warm_cache:
+            refresh_response_cache()
         
-        logger.info(f"✅ Sync completed for {date_str}: {records_processed} processed, {records_added} added, {records_updated} updated")
+        logger.info(f"✅ Sync completed for {date_str}: {records_processed} processed, {records_added} added, {records_updated} updated, {records_unchanged} unchanged")
         
         return {
             'status': 'success',
             'date': date_str,
             'processed': records_processed,
             'added': records_added,
-            'updated': records_updated
+            'updated': records_updated,
+            'unchanged': records_unchanged,
+            'timings': timings
         }
         
     except Exception as e:
-        sync_log.status = 'failed'
+        # Discard the chunk being written; in stream mode earlier chunks
+        # are committed, and 'partial' logs start a new cache generation
+        db.rollback()
+        sync_log.status = 'partial' if partial_writes else 'failed'
         sync_log.error_message = str(e)
+        finish_state('failed', error_message=str(e))
         db.commit()
         logger.error(f"❌ Sync failed for {date_str}: {e}")
+        if partial_writes and warm_cache:
+            refresh_response_cache()
         return {
             'status': 'failed',
             'date': date_str,
-            'error': str(e)
+            'error': str(e),
+            'partial': partial_writes
         }
     finally:
+        fetch_slot.close()
         db.close()
 
 
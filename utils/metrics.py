@@ -0,0 +1,315 @@
+"""Request, query and connection pool metrics in Prometheus text format.
+
+MetricsMiddleware times every request by route template. SQLAlchemy cursor
+events on the instrumented engines count statements and database time,
+both in total and for the current request or sync (tracked through a
+context variable, which the async engine's greenlets inherit). Statements
+slower than SLOW_QUERY_MS are logged with their SQL. The engines' pools
+time how long a checkout waits for a connection.
+
+Metrics live in the process that records them: /metrics reports the web
+worker it is served by, and CLI syncs log their query counts instead.
+"""
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Statements running at least this long are logged
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', '500')) / 1000
+
+# Longest statement text logged for a slow query
+SLOW_QUERY_MAX_CHARS = 2000
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Counter:
+    """Monotonic counter with labels.
+
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labelnames: Label names, in order
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        """Add an amount to the counter of a label set."""
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}_total{_label_text(self.labelnames, key)} {value}'
+
+
+class Histogram:
+    """Cumulative histogram with labels.
+
+    Args:
+        name: Metric name
+        documentation: HELP text
+        labelnames: Label names, in order
+        buckets: Upper bounds of the buckets, ascending (+Inf is implied)
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        """Record one observation for a label set."""
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[0][i] += 1
+            counts[1] += 1
+            counts[2] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(buckets), count, total) for key, (buckets, count, total) in self._values.items()}
+        bucket_labels = self.labelnames + ('le',)
+        for key, (buckets, count, total) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, buckets):
+                yield f'{self.name}_bucket{_label_text(bucket_labels, key + (bound,))} {bucket_count}'
+            yield f'{self.name}_bucket{_label_text(bucket_labels, key + ("+Inf",))} {count}'
+            yield f'{self.name}_count{_label_text(self.labelnames, key)} {count}'
+            yield f'{self.name}_sum{_label_text(self.labelnames, key)} {total}'
+
+
+# Every metric, in exposition order
+REGISTRY = []
+
+# Engines whose pool state is reported, by label
+_pools = {}
+
+http_request_duration = Histogram(
+    'tenders_http_request_duration_seconds', 'Time to send a complete response, by route',
+    ('method', 'route', 'status')
+)
+http_request_queries = Histogram(
+    'tenders_http_request_queries', 'SQL statements run per request, by route', ('route',), QUERY_COUNT_BUCKETS
+)
+http_request_db_seconds = Histogram(
+    'tenders_http_request_db_seconds', 'Time spent in SQL statements per request, by route', ('route',)
+)
+db_queries = Counter('tenders_db_queries', 'SQL statements run, by engine', ('engine',))
+db_query_duration = Histogram('tenders_db_query_duration_seconds', 'SQL statement run time, by engine', ('engine',))
+db_slow_queries = Counter('tenders_db_slow_queries', 'SQL statements slower than SLOW_QUERY_MS', ('engine',))
+db_pool_checkout_wait = Histogram(
+    'tenders_db_pool_checkout_wait_seconds', 'Time waited for a pooled connection, by engine',
+    ('engine',), POOL_WAIT_BUCKETS
+)
+sync_queries = Counter('tenders_sync_queries', 'SQL statements run by syncs', ('status',))
+sync_db_seconds = Counter('tenders_sync_db_seconds', 'Time syncs spent in SQL statements', ('status',))
+
+
+class QueryStats:
+    """Statements run and time spent in them within a track_queries() block."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_current_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+@contextmanager
+def track_queries():
+    """Count the statements run in this block (and the tasks it starts).
+
+    Yields:
+        QueryStats: Filled in as statements finish
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def instrument_engine(engine, label):
+    """Count and time the statements of a (sync) engine, logging slow ones.
+
+    Args:
+        engine: SQLAlchemy engine (async engines pass their sync_engine)
+        label: Value of the engine label
+    """
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        db_queries.inc(engine=label)
+        db_query_duration.observe(elapsed, engine=label)
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+        if elapsed >= SLOW_QUERY_SECONDS:
+            db_slow_queries.inc(engine=label)
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.0f} ms, {label}): {' '.join(statement.split())[:SLOW_QUERY_MAX_CHARS]}"
+            )
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    _pools[label] = engine.pool
+
+
+class _CheckoutTimer:
+    metrics_label = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started, engine=self.metrics_label)
+
+
+class MeteredQueuePool(_CheckoutTimer, QueuePool):
+    """QueuePool that records checkout waits of the sync engine."""
+    metrics_label = 'sync'
+
+
+class MeteredAsyncQueuePool(_CheckoutTimer, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout waits of the async engine."""
+    metrics_label = 'async'
+
+
+def track_sync_queries(sync):
+    """Decorate a sync function returning a result dict with its query stats.
+
+    The statement count and database time are logged, added to the
+    result's timings and counted in the sync metrics.
+    """
+
+    @functools.wraps(sync)
+    def wrapper(*args, **kwargs):
+        with track_queries() as stats:
+            result = sync(*args, **kwargs)
+        status = result.get('status', 'unknown')
+        sync_queries.inc(stats.queries, status=status)
+        sync_db_seconds.inc(stats.seconds, status=status)
+        result.setdefault('timings', {}).update(db_queries=stats.queries, db_seconds=stats.seconds)
+        logger.info(f"{result.get('date', 'Sync')}: {stats.queries} queries, {stats.seconds:.2f}s in the database")
+        return result
+
+    return wrapper
+
+
+def _pool_samples():
+    gauges = (
+        ('tenders_db_pool_size', 'Connections the pool keeps open', lambda pool: pool.size()),
+        ('tenders_db_pool_checked_out', 'Connections currently checked out', lambda pool: pool.checkedout()),
+        ('tenders_db_pool_overflow', 'Connections open beyond the pool size', lambda pool: max(pool.overflow(), 0)),
+    )
+    for name, documentation, read in gauges:
+        yield f'# HELP {name} {documentation}'
+        yield f'# TYPE {name} gauge'
+        for label, pool in sorted(_pools.items()):
+            if isinstance(pool, QueuePool):
+                yield f'{name}{_label_text(("engine",), (label,))} {read(pool)}'
+
+
+def render_metrics():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        name = metric.name + '_total' if metric.kind == 'counter' else metric.name
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(metric.samples())
+    lines.extend(_pool_samples())
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing requests and counting their statements.
+
+    Requests are labelled with the template of the route that handled them
+    ('/notice/{identifier:path}'), or 'unmatched', so label sets stay bounded.
+
+    Args:
+        app: ASGI application
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                route = getattr(scope.get('route'), 'path', 'unmatched')
+                http_request_duration.observe(
+                    time.perf_counter() - started, method=scope['method'], route=route, status=status
+                )
+                http_request_queries.observe(stats.queries, route=route)
+                http_request_db_seconds.observe(stats.seconds, route=route)
@@ -0,0 +1,191 @@
+"""Schema migrations for existing deployments.
+
+init_db() creates missing tables with create_all(), which never alters a
+table that already exists. Column additions, backfills and indexes for
+existing tables are listed here as named steps; each step runs once, in
+order, and is recorded in tenders_lv.schema_migrations.
+
+A step is a SQL string, or a function taking the connection for changes
+that depend on the current schema. Migrations only run on PostgreSQL.
+Other databases (SQLite in benchmarks) are always created fresh from the
+models.
+"""
+import logging
+from sqlalchemy import text
+from .partitions import partition_notices
+
+logger = logging.getLogger(__name__)
+
+# organizations.key of a procurement_notices row, see 0007_organizations
+_ORGANIZATION_KEY_SQL = (
+    "coalesce("
+    "nullif(left(btrim(organization_identifier, E' \\t\\r\\n'), 255), ''), "
+    "nullif(left('name:' || lower(btrim(regexp_replace(organization_name, '\\s+', ' ', 'g'))), 255), 'name:'))"
+)
+
+
+def _if_column_exists(table, column, statement):
+    """Step running a statement only if a tenders_lv table has a column.
+    
+    For steps written against a schema that create_all() no longer
+    produces: databases created since then skip them, and a later
+    migration brings the data up to date.
+    """
+    def step(conn):
+        exists = conn.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = 'tenders_lv' AND table_name = :table AND column_name = :column"
+        ), {'table': table, 'column': column}).first()
+        if exists:
+            conn.execute(text(statement))
+    return step
+
+
+MIGRATIONS = [
+    ('0001_content_hash', [
+        "ALTER TABLE tenders_lv.procurement_notices ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+        "ALTER TABLE tenders_lv.data_sync_log ADD COLUMN IF NOT EXISTS records_unchanged INTEGER DEFAULT 0",
+    ]),
+    ('0002_estimated_amount', [
+        "ALTER TABLE tenders_lv.procurement_notices ADD COLUMN IF NOT EXISTS estimated_amount NUMERIC",
+        # Same rule as parse_amount() at ingest time
+        "UPDATE tenders_lv.procurement_notices SET estimated_amount = CAST(estimated_value AS NUMERIC) "
+        "WHERE estimated_amount IS NULL AND estimated_value ~ '^\\d+\\.?\\d*$'",
+        "CREATE INDEX IF NOT EXISTS ix_tenders_lv_procurement_notices_estimated_amount "
+        "ON tenders_lv.procurement_notices (estimated_amount)",
+    ]),
+    ('0003_route_indexes', [
+        "ALTER TABLE tenders_lv.procurement_notices ADD COLUMN IF NOT EXISTS cpv_division VARCHAR(2)",
+        "UPDATE tenders_lv.procurement_notices SET cpv_division = substring(cpv_type, 1, 2) "
+        "WHERE cpv_division IS NULL AND cpv_type IS NOT NULL AND cpv_type <> ''",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_created_at "
+        "ON tenders_lv.procurement_notices (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_notice_type_created_at "
+        "ON tenders_lv.procurement_notices (notice_type, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_deadline "
+        "ON tenders_lv.procurement_notices (deadline_receipt_tenders_date)",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_organization_amount "
+        "ON tenders_lv.procurement_notices (organization_name, estimated_amount)",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_cpv_division "
+        "ON tenders_lv.procurement_notices (cpv_division)",
+        # Replaces the plain estimated_amount index from 0002 for the value sort
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_value_sort "
+        "ON tenders_lv.procurement_notices (estimated_amount DESC NULLS LAST, created_at DESC)",
+        "DROP INDEX IF EXISTS tenders_lv.ix_tenders_lv_procurement_notices_estimated_amount",
+    ]),
+    # Weighted name > organization and CPV code > description, each indexed
+    # with the 'simple' and 'english' configurations (see utils/search.py)
+    ('0004_search_vector', [
+        "ALTER TABLE tenders_lv.procurement_notices ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(organization_name, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(organization_name, '')), 'B') || "
+        "setweight(to_tsvector('simple', translate(coalesce(cpv_type, ''), '-', ' ')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+        ") STORED",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_search_vector "
+        "ON tenders_lv.procurement_notices USING GIN (search_vector)",
+    ]),
+    # Keyset pagination orders by (created_at, id), see utils/pagination.py
+    ('0005_keyset_indexes', [
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_created_at_id "
+        "ON tenders_lv.procurement_notices (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_notice_type_created_at_id "
+        "ON tenders_lv.procurement_notices (notice_type, created_at, id)",
+        "DROP INDEX IF EXISTS tenders_lv.ix_procurement_notices_created_at",
+        "DROP INDEX IF EXISTS tenders_lv.ix_procurement_notices_notice_type_created_at",
+    ]),
+    # Rollups keyed on organization_name; 0007_organizations recreates and
+    # refills the table keyed on organization_id
+    ('0006_notice_rollup', [
+        _if_column_exists('notice_rollup', 'organization_name',
+            "INSERT INTO tenders_lv.notice_rollup "
+            "(day, notice_type, cpv_division, organization_name, notice_count, value_count, value_sum) "
+            "SELECT date(created_at), coalesce(notice_type, ''), coalesce(cpv_division, ''), "
+            "coalesce(organization_name, ''), count(*), count(estimated_amount), coalesce(sum(estimated_amount), 0) "
+            "FROM tenders_lv.procurement_notices WHERE created_at IS NOT NULL "
+            "GROUP BY 1, 2, 3, 4 "
+            "ON CONFLICT DO NOTHING"),
+    ]),
+    # Organization dimension; the key expression mirrors
+    # utils.organizations.organization_key()
+    ('0007_organizations', [
+        "ALTER TABLE tenders_lv.procurement_notices ADD COLUMN IF NOT EXISTS organization_id INTEGER "
+        "REFERENCES tenders_lv.organizations (id)",
+        f"INSERT INTO tenders_lv.organizations (key, identifier, name, city, created_at, updated_at) "
+        f"SELECT DISTINCT ON (1) {_ORGANIZATION_KEY_SQL}, organization_identifier, organization_name, "
+        f"organization_city, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc' "
+        f"FROM tenders_lv.procurement_notices WHERE {_ORGANIZATION_KEY_SQL} IS NOT NULL "
+        f"ORDER BY 1, updated_at DESC "
+        f"ON CONFLICT (key) DO NOTHING",
+        f"UPDATE tenders_lv.procurement_notices n SET organization_id = o.id "
+        f"FROM tenders_lv.organizations o WHERE n.organization_id IS NULL AND o.key = {_ORGANIZATION_KEY_SQL}",
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_organization_id "
+        "ON tenders_lv.procurement_notices (organization_id)",
+        "DROP INDEX IF EXISTS tenders_lv.ix_procurement_notices_organization_amount",
+        # The rollup is keyed on organization_id now; it is derived data, so recreate it
+        "DROP TABLE IF EXISTS tenders_lv.notice_rollup",
+        "CREATE TABLE tenders_lv.notice_rollup ("
+        "day DATE NOT NULL, notice_type VARCHAR(100) NOT NULL, cpv_division VARCHAR(2) NOT NULL, "
+        "organization_id INTEGER NOT NULL, notice_count INTEGER NOT NULL, value_count INTEGER NOT NULL, "
+        "value_sum NUMERIC NOT NULL, PRIMARY KEY (day, notice_type, cpv_division, organization_id))",
+        "INSERT INTO tenders_lv.notice_rollup "
+        "(day, notice_type, cpv_division, organization_id, notice_count, value_count, value_sum) "
+        "SELECT date(created_at), coalesce(notice_type, ''), coalesce(cpv_division, ''), "
+        "coalesce(organization_id, 0), count(*), count(estimated_amount), coalesce(sum(estimated_amount), 0) "
+        "FROM tenders_lv.procurement_notices WHERE created_at IS NOT NULL "
+        "GROUP BY 1, 2, 3, 4",
+    ]),
+    # Month partitions on created_at, see utils/partitions.py
+    ('0008_partition_notices', [
+        "CREATE TABLE IF NOT EXISTS tenders_lv.notice_identifiers ("
+        "identifier VARCHAR(255) PRIMARY KEY, created_at TIMESTAMP NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_tenders_lv_notice_identifiers_created_at "
+        "ON tenders_lv.notice_identifiers (created_at)",
+        partition_notices,
+    ]),
+    # Order and since= filter of the exports, see utils/export.py
+    ('0009_export_index', [
+        "CREATE INDEX IF NOT EXISTS ix_procurement_notices_updated_at_id "
+        "ON tenders_lv.procurement_notices (updated_at, id)",
+    ]),
+]
+
+
+def run_migrations(engine):
+    """Apply pending migrations.
+    
+    Args:
+        engine: SQLAlchemy engine
+    
+    Returns:
+        list: Names of the migrations applied by this call
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+    
+    applied = []
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS tenders_lv.schema_migrations ("
+            "name VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP DEFAULT now())"
+        ))
+        done = set(conn.execute(text("SELECT name FROM tenders_lv.schema_migrations")).scalars())
+    
+    for name, statements in MIGRATIONS:
+        if name in done:
+            continue
+        logger.info(f"Applying migration {name}")
+        with engine.begin() as conn:
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(text("INSERT INTO tenders_lv.schema_migrations (name) VALUES (:name)"), {'name': name})
+        applied.append(name)
+    
+    return applied
@@ -0,0 +1,88 @@
+"""Organization dimension maintained during ingestion.
+
+Notices reference tenders_lv.organizations through organization_id.
+Organizations are keyed by registration number when the feed provides
+one, so name variants of the same buyer collapse into one row, and by
+the normalized name otherwise. The latest name and city seen win.
+"""
+import re
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from .database import Organization
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def organization_key(values):
+    """Return the organizations.key of a normalized notice, or None.
+
+    Args:
+        values: Dictionary from normalize_notice
+    """
+    identifier = (values.get('organization_identifier') or '').strip()
+    if identifier:
+        return identifier[:255]
+    name = _WHITESPACE.sub(' ', values.get('organization_name') or '').strip().lower()
+    if name:
+        return ('name:' + name)[:255]
+    return None
+
+
+def resolve_organizations(db, rows):
+    """Set organization_id on normalized notices, creating organizations as needed.
+
+    One SELECT resolves the known organizations of the batch; unknown ones
+    are inserted with one INSERT ... ON CONFLICT DO NOTHING and selected
+    again, so concurrent writers agree on the ids.
+
+    Args:
+        db: Database session (the caller commits)
+        rows: List of dictionaries from normalize_notice, updated in place
+    """
+    latest = {}
+    for row in rows:
+        key = organization_key(row)
+        row['organization_id'] = key  # Replaced by the id below
+        if key:
+            latest[key] = row
+    if not latest:
+        return
+
+    known = {
+        org.key: org for org in db.execute(
+            select(Organization.id, Organization.key, Organization.name, Organization.city).where(
+                Organization.key.in_(list(latest))
+            )
+        )
+    }
+    ids = {key: org.id for key, org in known.items()}
+
+    now = datetime.utcnow()
+    for key, org in sorted(known.items()):
+        row = latest[key]
+        if (row['organization_name'], row['organization_city']) != (org.name, org.city):
+            db.execute(update(Organization).where(Organization.id == org.id).values(
+                name=row['organization_name'], city=row['organization_city'], updated_at=now
+            ))
+
+    missing = sorted(key for key in latest if key not in known)
+    if missing:
+        insert = postgresql.insert if db.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        db.execute(insert(Organization).on_conflict_do_nothing(index_elements=['key']), [
+            {
+                'key': key,
+                'identifier': latest[key]['organization_identifier'],
+                'name': latest[key]['organization_name'],
+                'city': latest[key]['organization_city'],
+                'created_at': now,
+                'updated_at': now,
+            }
+            for key in missing
+        ])
+        ids.update(db.execute(
+            select(Organization.key, Organization.id).where(Organization.key.in_(missing))
+        ).all())
+
+    for row in rows:
+        row['organization_id'] = ids.get(row['organization_id'])
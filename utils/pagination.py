@@ -0,0 +1,129 @@
+"""Keyset pagination and row counts for the procurement list.
+
+Pages of the default (newest first) listing are addressed by a cursor on
+(created_at, id) instead of an OFFSET, so every page is one index range
+scan no matter how deep it is. Totals are optional extras: on PostgreSQL
+large result sets report the planner's row estimate, and exact counts are
+cached for a few minutes.
+
+Both helpers take a select() over ProcurementNotice and an AsyncSession.
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from .database import ProcurementNotice
+
+# Exact counts are cached this long (seconds)
+COUNT_CACHE_TTL = 300
+
+# Estimated totals below this are counted exactly instead
+EXACT_COUNT_THRESHOLD = 1000
+
+# Most cached totals kept at once
+COUNT_CACHE_SIZE = 256
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def encode_cursor(notice):
+    """Return an opaque, URL-safe cursor pointing at a notice."""
+    key = f"{notice.created_at.isoformat()}|{notice.id}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor().
+
+    Returns:
+        tuple: (created_at, id), or None if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, notice_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(notice_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+async def keyset_page(db, statement, after=None, before=None, limit=20):
+    """Fetch one page of a ProcurementNotice select, newest first.
+
+    Args:
+        db: Async database session
+        statement: Filtered select() over ProcurementNotice
+        after: Cursor of the last notice on the previous page
+        before: Cursor of the first notice on the next page (paging back)
+        limit: Page size
+
+    Returns:
+        tuple: (notices, cursor for the next page or None, cursor for the
+        previous page or None)
+    """
+    key = tuple_(ProcurementNotice.created_at, ProcurementNotice.id)
+
+    position = decode_cursor(before) if before else None
+    if position:
+        rows = (await db.scalars(statement.filter(key > tuple_(*position)).order_by(
+            ProcurementNotice.created_at, ProcurementNotice.id
+        ).limit(limit + 1))).all()
+        has_more = len(rows) > limit
+        notices = rows[:limit][::-1]
+        prev_cursor = encode_cursor(notices[0]) if has_more else None
+        next_cursor = encode_cursor(notices[-1]) if notices else None
+        return notices, next_cursor, prev_cursor
+
+    position = decode_cursor(after) if after else None
+    if position:
+        statement = statement.filter(key < tuple_(*position))
+    rows = (await db.scalars(statement.order_by(
+        ProcurementNotice.created_at.desc(), ProcurementNotice.id.desc()
+    ).limit(limit + 1))).all()
+    notices = rows[:limit]
+    next_cursor = encode_cursor(notices[-1]) if len(rows) > limit else None
+    prev_cursor = encode_cursor(notices[0]) if position and notices else None
+    return notices, next_cursor, prev_cursor
+
+
+async def count_rows(db, statement, exact=False):
+    """Count the rows of a select, estimating on PostgreSQL when large.
+
+    Args:
+        db: Async database session
+        statement: SQLAlchemy select()
+        exact: Always return an exact (possibly cached) count
+
+    Returns:
+        tuple: (count, True if the count is a planner estimate)
+    """
+    is_postgresql = db.get_bind().dialect.name == 'postgresql'
+    # Named parameters, so the estimate below can run the SQL as text()
+    compiled = statement.compile(
+        dialect=postgresql.dialect(paramstyle='named') if is_postgresql else db.get_bind().dialect
+    )
+    cache_key = (str(compiled), repr(sorted(compiled.params.items())))
+
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(cache_key)
+        if cached and now - cached[0] < COUNT_CACHE_TTL:
+            return cached[1], False
+
+    if not exact and is_postgresql:
+        plan = await db.scalar(text('EXPLAIN (FORMAT JSON) ' + str(compiled)), compiled.params)
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]['Plan']['Plan Rows']
+        if estimate >= EXACT_COUNT_THRESHOLD:
+            return int(estimate), True
+
+    total = await db.scalar(select(func.count()).select_from(statement.order_by(None).subquery()))
+    with _count_lock:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            _count_cache.pop(min(_count_cache, key=lambda k: _count_cache[k][0]))
+        _count_cache[cache_key] = (now, total)
+    return total, False
@@ -0,0 +1,224 @@
+"""Monthly partitions of tenders_lv.procurement_notices (PostgreSQL).
+
+procurement_notices is range-partitioned on created_at, one partition per
+calendar month (procurement_notices_y2025m11 holds November 2025). Route
+queries filter or order on created_at, so the planner prunes partitions
+outside their range. created_at is the publication date of the daily file
+a notice was first stored from (not the time of the ingest), so backfills
+fill the months they cover and old months can be archived. It never
+changes, so updates stay in their partition; identifiers are kept globally
+unique by tenders_lv.notice_identifiers.
+
+sync_date and load-dir create the partitions they are about to write to.
+Old months can be detached into standalone tables (to archive with
+pg_dump -t and drop) without touching the rest of the table. Detached
+notices still count in the analytics rollups until rebuild-rollups.
+
+Other databases (SQLite in benchmarks) use a plain table.
+"""
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import text
+from .database import ProcurementNotice
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'tenders_lv.procurement_notices'
+
+# Months with a partition known to exist, per database URL
+_known_partitions = set()
+_partition_lock = threading.Lock()
+
+
+def month_start(moment):
+    """Return the first instant of the month containing moment."""
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(month):
+    """Return the first instant of the month after month."""
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Return the table name of the partition holding a month."""
+    return f"procurement_notices_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(conn):
+    """Return True if procurement_notices is a partitioned table.
+
+    Args:
+        conn: SQLAlchemy connection or engine
+    """
+    if conn.dialect.name != 'postgresql':
+        return False
+    query = text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass('tenders_lv.procurement_notices'))"
+    )
+    if hasattr(conn, 'connect'):
+        with conn.connect() as connection:
+            return connection.execute(query).scalar()
+    return conn.execute(query).scalar()
+
+
+def _create_partition(conn, month):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS tenders_lv.{partition_name(month)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month(month):%Y-%m-%d}')"
+    ))
+
+
+def ensure_notice_partitions(engine, *moments):
+    """Create the partitions that rows created at the given moments go to.
+
+    Each partition is created in its own short transaction, so writers
+    never hold the parent table's lock while they ingest. Known partitions
+    are remembered, so repeat calls cost nothing.
+
+    Args:
+        engine: SQLAlchemy engine
+        *moments: datetimes (defaults to now and the start of next month)
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+    now = datetime.utcnow()
+    months = {month_start(moment) for moment in (moments or (now, next_month(month_start(now))))}
+    url = str(engine.url)
+    with _partition_lock:
+        missing = sorted(month for month in months if (url, month) not in _known_partitions)
+        if not missing:
+            return
+        if not is_partitioned(engine):
+            _known_partitions.update((url, month) for month in missing)
+            return
+        for month in missing:
+            with engine.begin() as conn:
+                _create_partition(conn, month)
+            _known_partitions.add((url, month))
+
+
+def list_partitions(engine):
+    """List notice partitions with their bounds and estimated row counts.
+
+    Returns:
+        list: (partition name, bounds expression, estimated rows) tuples
+    """
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('tenders_lv.procurement_notices') "
+            "ORDER BY c.relname"
+        )).all()
+
+
+def detach_partition(engine, month):
+    """Detach one month from procurement_notices into a standalone table.
+
+    The month's identifiers are released from the registry, so a notice
+    that shows up again later is stored as a new one.
+
+    Args:
+        engine: SQLAlchemy engine
+        month: Any datetime within the month
+
+    Returns:
+        str: Name of the detached table (in the tenders_lv schema)
+    """
+    month = month_start(month)
+    if month >= month_start(datetime.utcnow()):
+        raise ValueError("Only past months can be detached, syncs still write to this one")
+    name = partition_name(month)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION tenders_lv.{name}"))
+        conn.execute(text(
+            "DELETE FROM tenders_lv.notice_identifiers WHERE created_at >= :start AND created_at < :end"
+        ), {'start': month, 'end': next_month(month)})
+    with _partition_lock:
+        _known_partitions.discard((str(engine.url), month))
+    logger.info(f"Detached {name}; archive it with pg_dump -t tenders_lv.{name}, then drop it")
+    return name
+
+
+def partition_notices(conn):
+    """Convert procurement_notices into a month-partitioned table.
+
+    Used by migration 0008. Copies the rows into a new partitioned table
+    with the same columns, then recreates the constraints and indexes on it.
+
+    Args:
+        conn: SQLAlchemy connection inside the migration transaction
+    """
+    if is_partitioned(conn):
+        return
+
+    # created_at becomes the (non-null) partition key; notices without one
+    # were left out of the rollups so far, count them in on their new day
+    fill = "coalesce(updated_at, now() AT TIME ZONE 'utc')"
+    conn.execute(text(
+        f"INSERT INTO tenders_lv.notice_rollup "
+        f"(day, notice_type, cpv_division, organization_id, notice_count, value_count, value_sum) "
+        f"SELECT date({fill}), coalesce(notice_type, ''), coalesce(cpv_division, ''), coalesce(organization_id, 0), "
+        f"count(*), count(estimated_amount), coalesce(sum(estimated_amount), 0) "
+        f"FROM {PARENT_TABLE} WHERE created_at IS NULL AND identifier IS NOT NULL GROUP BY 1, 2, 3, 4 "
+        f"ON CONFLICT (day, notice_type, cpv_division, organization_id) DO UPDATE SET "
+        f"notice_count = notice_rollup.notice_count + EXCLUDED.notice_count, "
+        f"value_count = notice_rollup.value_count + EXCLUDED.value_count, "
+        f"value_sum = notice_rollup.value_sum + EXCLUDED.value_sum"
+    ))
+    conn.execute(text(f"UPDATE {PARENT_TABLE} SET created_at = {fill} WHERE created_at IS NULL"))
+    conn.execute(text(
+        f"INSERT INTO tenders_lv.notice_identifiers (identifier, created_at) "
+        f"SELECT identifier, created_at FROM {PARENT_TABLE} WHERE identifier IS NOT NULL "
+        f"ON CONFLICT DO NOTHING"
+    ))
+    conn.execute(text(f"DELETE FROM {PARENT_TABLE} WHERE identifier IS NULL"))
+
+    columns = ', '.join(conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = 'tenders_lv' AND table_name = 'procurement_notices' AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    )).scalars())
+    oldest, newest = conn.execute(text(f"SELECT min(created_at), max(created_at) FROM {PARENT_TABLE}")).one()
+
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO procurement_notices_unpartitioned"))
+    conn.execute(text(
+        f"CREATE TABLE {PARENT_TABLE} (LIKE tenders_lv.procurement_notices_unpartitioned "
+        f"INCLUDING DEFAULTS INCLUDING GENERATED) PARTITION BY RANGE (created_at)"
+    ))
+    sequence = conn.execute(text(
+        "SELECT pg_get_serial_sequence('tenders_lv.procurement_notices_unpartitioned', 'id')"
+    )).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.id"))
+
+    now = datetime.utcnow()
+    month = month_start(oldest or now)
+    last = next_month(month_start(max(newest or now, now)))
+    while month <= last:
+        _create_partition(conn, month)
+        month = next_month(month)
+
+    conn.execute(text(
+        f"INSERT INTO {PARENT_TABLE} ({columns}) "
+        f"SELECT {columns} FROM tenders_lv.procurement_notices_unpartitioned"
+    ))
+    conn.execute(text("DROP TABLE tenders_lv.procurement_notices_unpartitioned"))
+
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ADD PRIMARY KEY (id, created_at)"))
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT uq_procurement_notices_identifier_created_at "
+        f"UNIQUE (identifier, created_at)"
+    ))
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ADD FOREIGN KEY (organization_id) REFERENCES tenders_lv.organizations (id)"
+    ))
+    for index in ProcurementNotice.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS ix_procurement_notices_search_vector "
+        f"ON {PARENT_TABLE} USING GIN (search_vector)"
+    ))
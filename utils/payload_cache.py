@@ -0,0 +1,223 @@
+"""Content-addressed on-disk cache of raw daily notice files.
+
+Layout under the cache root:
+    objects/ab/abcdef...   raw response bodies, named by their SHA-256
+    meta/YYYY/MM/DD-MM-YYYY.json   per-date entry: hash, ETag, Last-Modified,
+                                   size and whether the body was ingested
+
+Entries are evicted least-recently-used first once the stored bodies exceed
+the configured size, down to EVICT_TO_FRACTION of it. A running total of
+the body sizes (from one walk of objects/, then updated by store()) keeps
+stores from rescanning the cache until eviction is due; the eviction scan
+recomputes it from disk, so bodies written by other processes and bodies
+no entry references any more are accounted for then. Writes go through a
+temporary file and os.replace so concurrent workers never observe a
+partial body.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Cache location; set IUB_CACHE_DIR to an empty string to disable caching
+IUB_CACHE_DIR = os.getenv('IUB_CACHE_DIR', '.cache/iub')
+IUB_CACHE_MAX_BYTES = int(os.getenv('IUB_CACHE_MAX_MB', '2048')) * 1024 * 1024
+
+# Eviction frees space down to this fraction of max_bytes, so a full cache
+# is not rescanned on every store
+EVICT_TO_FRACTION = 0.9
+
+
+class PayloadCache:
+    """Raw payload cache keyed by the API date string (YYYY/MM/DD-MM-YYYY).
+    
+    Args:
+        root: Cache directory
+        max_bytes: Upper bound for the total size of cached bodies
+    """
+    
+    def __init__(self, root, max_bytes=IUB_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # Size of every body by hash, and their total; loaded on first store
+        self._sizes = None
+        self._total = 0
+    
+    def _meta_path(self, key):
+        return os.path.join(self.root, 'meta', key + '.json')
+    
+    def blob_path(self, sha256):
+        """Return the path of a cached body."""
+        return os.path.join(self.root, 'objects', sha256[:2], sha256)
+    
+    def get(self, key):
+        """Return the cache entry for a date string, or None if absent.
+        
+        Marks the entry as recently used.
+        """
+        path = self._meta_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.blob_path(entry['sha256'])):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+    
+    def _write_meta(self, key, entry):
+        path = self._meta_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    
+    def store(self, key, chunks, etag=None, last_modified=None):
+        """Stream a response body into the cache.
+        
+        Args:
+            key: Date string
+            chunks: Iterable of body byte chunks
+            etag: ETag response header
+            last_modified: Last-Modified response header
+        
+        Returns:
+            dict: The new cache entry. ``ingested`` carries over when the
+            body is byte-identical to the previously cached one.
+        """
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        
+        sha256 = digest.hexdigest()
+        blob = self.blob_path(sha256)
+        # Publishing the body and its entry together keeps evict() from
+        # seeing the new body as unreferenced
+        with self._lock:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp_path, blob)
+            previous = self.get(key)
+            entry = {
+                'sha256': sha256,
+                'size': size,
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': datetime.utcnow().isoformat(),
+                'ingested': bool(previous and previous['sha256'] == sha256 and previous.get('ingested')),
+            }
+            self._write_meta(key, entry)
+            if self._sizes is None:
+                self._set_sizes(self._blob_sizes())
+            elif sha256 not in self._sizes:
+                self._sizes[sha256] = size
+                self._total += size
+            over_budget = self._total > self.max_bytes
+        if over_budget:
+            self.evict(keep=key)
+        return entry
+    
+    def mark_ingested(self, key, sha256):
+        """Record that the body with the given hash was written to the database."""
+        entry = self.get(key)
+        if entry and entry['sha256'] == sha256 and not entry.get('ingested'):
+            entry['ingested'] = True
+            self._write_meta(key, entry)
+    
+    def keys(self):
+        """Return all cached date strings in sorted order."""
+        meta_root = os.path.join(self.root, 'meta')
+        keys = []
+        for dirpath, _, filenames in os.walk(meta_root):
+            for filename in filenames:
+                if filename.endswith('.json'):
+                    path = os.path.join(dirpath, filename)
+                    keys.append(os.path.relpath(path, meta_root)[:-len('.json')].replace(os.sep, '/'))
+        return sorted(keys)
+    
+    def _blob_sizes(self):
+        sizes = {}
+        objects_root = os.path.join(self.root, 'objects')
+        for dirpath, _, filenames in os.walk(objects_root):
+            for filename in filenames:
+                sizes[filename] = os.path.getsize(os.path.join(dirpath, filename))
+        return sizes
+    
+    def _set_sizes(self, sizes):
+        self._sizes = sizes
+        self._total = sum(sizes.values())
+    
+    def evict(self, keep=None):
+        """Drop least-recently-used entries until bodies fit in max_bytes.
+        
+        Frees space down to EVICT_TO_FRACTION of max_bytes. Scans every
+        entry and body, so store() only calls it when the running total is
+        over max_bytes.
+        
+        Args:
+            keep: Date string that must survive eviction (the entry being stored)
+        """
+        with self._lock:
+            entries = []
+            for key in self.keys():
+                path = self._meta_path(key)
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        entries.append((os.path.getmtime(path), path, json.load(f)['sha256']))
+                except (OSError, ValueError, KeyError):
+                    continue
+            refs = Counter(sha256 for _, _, sha256 in entries)
+            
+            sizes = self._blob_sizes()
+            
+            # Bodies no entry points at any more are always removed
+            for sha256 in [s for s in sizes if refs[s] == 0]:
+                self._remove_blob(sha256)
+                del sizes[sha256]
+            
+            total = sum(sizes.values())
+            target = self.max_bytes * EVICT_TO_FRACTION if total > self.max_bytes else self.max_bytes
+            keep_path = self._meta_path(keep) if keep else None
+            for _, path, sha256 in sorted(entries):
+                if total <= target:
+                    break
+                if path == keep_path:
+                    continue
+                os.remove(path)
+                refs[sha256] -= 1
+                if refs[sha256] == 0 and sha256 in sizes:
+                    self._remove_blob(sha256)
+                    total -= sizes.pop(sha256)
+                logger.debug(f"Evicted cached payload {path}")
+            self._set_sizes(sizes)
+    
+    def _remove_blob(self, sha256):
+        try:
+            os.remove(self.blob_path(sha256))
+        except FileNotFoundError:
+            pass
+
+
+payload_cache = PayloadCache(IUB_CACHE_DIR) if IUB_CACHE_DIR else None
@@ -0,0 +1,178 @@
+"""Rendered response cache shared by all web workers.
+
+Analytics only change when a sync writes new data, so their rendered
+fragments are cached in a small SQLite file (no external service; every
+worker process opens the same file) and keyed by the generation: the id of
+the latest DataSyncLog that wrote notices. A successful sync starts a new
+generation, drops the old one and renders the fragments again, so the
+first visitor after a sync is served from the cache too.
+
+Entries also expire after a TTL (some figures depend on the current time)
+and the least recently used ones are evicted beyond a size bound. Cache
+errors are logged and treated as misses; they never fail a request.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from sqlalchemy import func, select
+from .database import DataSyncLog
+
+logger = logging.getLogger(__name__)
+
+# Cache file; set RESPONSE_CACHE_PATH to an empty string to disable caching
+RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', '.cache/responses.sqlite3')
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '900'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_MB', '64')) * 1024 * 1024
+
+
+def cache_generation(db):
+    """Return the id of the latest DataSyncLog that wrote notices, or 0.
+
+    That is a successful sync, or a failed one that had already committed
+    some of its chunks ('partial').
+    """
+    return db.scalar(
+        select(func.max(DataSyncLog.id)).where(DataSyncLog.status.in_(('success', 'partial')))
+    ) or 0
+
+
+class ResponseCache:
+    """SQLite-backed cache of JSON-serializable values, per generation.
+
+    Args:
+        path: SQLite file, shared by every process using the cache
+        ttl: Seconds an entry stays valid
+        max_bytes: Upper bound for the total size of cached values
+    """
+
+    def __init__(self, path, ttl=RESPONSE_CACHE_TTL, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, generation INTEGER NOT NULL, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, generation):
+        """Return the cached value of a key for a generation, or None."""
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ? AND generation = ?", (key, generation)
+            ).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.warning(f"Response cache read failed for {key}: {e}")
+            return None
+
+    def set(self, key, generation, value):
+        """Store a value for a key and generation, evicting old entries as needed."""
+        data = json.dumps(value)
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, generation, value, size, stored_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, generation, data, len(data), now, now)
+            )
+            self.evict()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Response cache write failed for {key}: {e}")
+
+    def get_or_set(self, key, generation, compute):
+        """Return the cached value of a key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key
+            generation: Current generation, see cache_generation()
+            compute: Function returning the value (JSON-serializable)
+        """
+        value = self.get(key, generation)
+        if value is None:
+            value = compute()
+            self.set(key, generation, value)
+        return value
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones beyond max_bytes."""
+        conn = self._connect()
+        conn.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - self.ttl,))
+        total = conn.execute("SELECT coalesce(sum(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY used_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self, keep_generation=None):
+        """Remove every entry, or every entry of other generations."""
+        try:
+            conn = self._connect()
+            if keep_generation is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE generation != ?", (keep_generation,))
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Response cache clear failed: {e}")
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_PATH) if RESPONSE_CACHE_PATH else None
+
+
+# Renders the current generation into the cache after a refresh. Set by
+# the CLI entry point (sync.py), so utils does not depend on the web routes.
+_cache_warmer = None
+
+
+def set_cache_warmer(warm):
+    """Set the function refresh_response_cache() calls to re-render entries.
+
+    Args:
+        warm: Callable taking no arguments, or None to only invalidate
+    """
+    global _cache_warmer
+    _cache_warmer = warm
+
+
+def refresh_response_cache():
+    """Drop stale cached responses and render the current ones.
+
+    Called after successful syncs. Without a cache warmer (see
+    set_cache_warmer) only the invalidation happens.
+    """
+    if response_cache is None:
+        return
+    if _cache_warmer is None:
+        logger.info("No analytics cache warmer set, clearing the response cache")
+        response_cache.clear()
+        return
+    try:
+        _cache_warmer()
+    except Exception as e:
+        logger.warning(f"Pre-warming the analytics cache failed: {e}")
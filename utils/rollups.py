@@ -0,0 +1,119 @@
+"""Incrementally maintained analytics rollups.
+
+Ingest collects, per chunk of written notices, how each
+(day, notice type, CPV division, organization id) cell of NoticeRollup
+changes: a new notice adds to the cell of its created_at day, an updated
+notice moves from its old cell to its new one. The deltas are applied
+with one INSERT ... ON CONFLICT DO UPDATE that adds to the stored
+counters, inside the caller's transaction.
+
+rebuild_rollups() recomputes the table from procurement_notices, for
+repairs and after bulk loads.
+"""
+import logging
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from .database import NoticeRollup, ProcurementNotice
+
+logger = logging.getLogger(__name__)
+
+# ProcurementNotice columns the rollup is keyed on, besides the day
+ROLLUP_DIMENSIONS = ('notice_type', 'cpv_division', 'organization_id')
+
+# Key value stored for notices without a dimension value
+ROLLUP_MISSING = {'notice_type': '', 'cpv_division': '', 'organization_id': 0}
+
+
+def rollup_key(day, values):
+    """Return the NoticeRollup key of a notice.
+
+    Args:
+        day: created_at date of the notice
+        values: Mapping or object with the ROLLUP_DIMENSIONS attributes
+    """
+    if isinstance(values, dict):
+        return (day,) + tuple(values.get(column) or ROLLUP_MISSING[column] for column in ROLLUP_DIMENSIONS)
+    return (day,) + tuple(getattr(values, column) or ROLLUP_MISSING[column] for column in ROLLUP_DIMENSIONS)
+
+
+def add_delta(deltas, key, amount, sign=1):
+    """Count a notice into (sign=1) or out of (sign=-1) a rollup cell.
+
+    Args:
+        deltas: Dictionary of rollup key -> [notice_count, value_count, value_sum]
+        key: Key from rollup_key()
+        amount: estimated_amount of the notice, or None
+        sign: 1 to add the notice, -1 to remove it
+    """
+    entry = deltas.setdefault(key, [0, 0, Decimal(0)])
+    entry[0] += sign
+    if amount is not None:
+        entry[1] += sign
+        entry[2] += sign * Decimal(amount)
+
+
+def apply_deltas(db, deltas):
+    """Add collected deltas to the stored rollup counters.
+
+    Args:
+        db: Database session (the caller commits)
+        deltas: Dictionary from add_delta()
+    """
+    params = [
+        dict(zip(('day',) + ROLLUP_DIMENSIONS, key),
+             notice_count=count, value_count=value_count, value_sum=value_sum)
+        # Sorted so concurrent writers lock shared cells in the same order
+        for key, (count, value_count, value_sum) in sorted(deltas.items())
+        if count or value_count or value_sum
+    ]
+    if not params:
+        return
+
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    stmt = insert(NoticeRollup)
+    table = NoticeRollup.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day] + [table.c[column] for column in ROLLUP_DIMENSIONS],
+        set_={
+            column: table.c[column] + stmt.excluded[column]
+            for column in ('notice_count', 'value_count', 'value_sum')
+        }
+    )
+    db.execute(stmt, params)
+
+
+def rebuild_rollups(db):
+    """Recompute NoticeRollup from procurement_notices.
+
+    Args:
+        db: Database session (the caller commits)
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    started = datetime.utcnow()
+    day = func.date(ProcurementNotice.created_at)
+    dimensions = [
+        func.coalesce(getattr(ProcurementNotice, column), ROLLUP_MISSING[column]) for column in ROLLUP_DIMENSIONS
+    ]
+    aggregate = select(
+        day,
+        *dimensions,
+        func.count(),
+        func.count(ProcurementNotice.estimated_amount),
+        func.coalesce(func.sum(ProcurementNotice.estimated_amount), 0)
+    ).where(
+        ProcurementNotice.created_at.isnot(None)
+    ).group_by(day, *dimensions)
+
+    db.execute(delete(NoticeRollup))
+    db.execute(NoticeRollup.__table__.insert().from_select(
+        ['day', *ROLLUP_DIMENSIONS, 'notice_count', 'value_count', 'value_sum'],
+        aggregate
+    ))
+    rows = db.query(func.count()).select_from(NoticeRollup).scalar()
+    logger.info(f"Rebuilt {rows} rollup rows in {(datetime.utcnow() - started).total_seconds():.1f}s")
+    return rows
@@ -3,11 +3,20 @@
 This module provides automated scheduling capabilities for daily data synchronization.
 It can be run as a standalone scheduler or configured as a cron job.
 """
+import argparse
 import schedule
 import time
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from sqlalchemy import select
+from .database import DB_POOL_SIZE, SessionLocal, SyncState, engine, init_db
 from .ingestion import sync_date, sync_latest_data
+from .partitions import detach_partition, ensure_notice_partitions, list_partitions
+from .payload_cache import payload_cache
+from .response_cache import refresh_response_cache
+from .rollups import rebuild_rollups
+from .throttle import SyncLimits
 
 # Configure logging
 logging.basicConfig(
@@ -21,48 +30,195 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def sync_date_range(start_date, end_date):
+def sync_date_range(start_date, end_date, workers=1, rate=1.0,
+                    fetch_concurrency=None, db_concurrency=None, mode='bulk',
+                    offline=False, force=False, processes=0):
     """Sync procurement data for a date range.
     
     Args:
         start_date: datetime object for start date
         end_date: datetime object for end date
+        workers, rate, fetch_concurrency, db_concurrency, mode, offline, force,
+        processes: See sync_dates
         
     Returns:
         list: List of sync results for each date
     """
-    logger.info(f"Starting bulk sync from {start_date.date()} to {end_date.date()}")
-    
-    results = []
+    days = []
     current_date = start_date
-    
     while current_date <= end_date:
-        result = sync_date(current_date)
-        results.append(result)
+        days.append(current_date)
         current_date += timedelta(days=1)
+    
+    return sync_dates(days, workers=workers, rate=rate, fetch_concurrency=fetch_concurrency,
+                      db_concurrency=db_concurrency, mode=mode, offline=offline, force=force,
+                      processes=processes)
+
+
+def sync_dates(days, workers=1, rate=1.0, fetch_concurrency=None,
+               db_concurrency=None, mode='bulk', offline=False, force=False,
+               processes=0):
+    """Sync procurement data for a list of days.
+    
+    Days are synced by a thread pool of ``workers`` threads. A shared token
+    bucket limits requests toward the open data API, and HTTP fetches and
+    database writes have separate concurrency limits.
+    
+    Args:
+        days: List of datetime objects, in the order they should be synced
+        workers: Number of days synced concurrently
+        rate: Maximum API requests per second (None or 0 disables the limit)
+        fetch_concurrency: Maximum simultaneous HTTP fetches (default: workers)
+        db_concurrency: Maximum simultaneous database writers
+            (default: workers, capped at the engine's pool_size)
+        mode: Ingest mode passed to sync_date ('bulk', 'stream' or 'row')
+        offline: Replay days from the payload cache instead of the network
+        force: Also re-sync days whose SyncState is already 'success'
+        processes: When > 0, run a pipelined import: a pool of this many
+            processes parses and normalizes daily files while a single
+            writer (db_concurrency defaults to 1) upserts the rows. Implies
+            mode='pipeline' and at least processes + 1 worker threads.
         
-        # Small delay to avoid overwhelming the API
-        time.sleep(1)
+    Returns:
+        list: List of sync results for each synced date
+    """
+    if days and not force:
+        done = completed_dates(days[0], days[-1])
+        skipped = [day for day in days if day.date() in done]
+        if skipped:
+            logger.info(f"Skipping {len(skipped)} already synced day(s), use --force to re-sync them")
+            days = [day for day in days if day.date() not in done]
+    
+    if not days:
+        logger.info("No days to sync")
+        return []
+    
+    # Creating a partition waits for every open write to the table, so
+    # create the range's months before the workers start writing
+    ensure_notice_partitions(engine, *days)
+    
+    normalize_pool = None
+    if processes:
+        mode = 'pipeline'
+        workers = max(workers, processes + 1)
+        db_concurrency = db_concurrency or 1
+        normalize_pool = ProcessPoolExecutor(max_workers=processes)
+    
+    start_date, end_date = days[0], days[-1]
+    logger.info(f"Starting bulk sync from {start_date.date()} to {end_date.date()} with {workers} worker(s)"
+                + (f" and {processes} normalize process(es)" if processes else ""))
+    
+    limits = SyncLimits(
+        rate=None if offline else rate,
+        burst=workers,
+        fetch_concurrency=fetch_concurrency or workers,
+        db_concurrency=db_concurrency or min(workers, DB_POOL_SIZE)
+    )
+    
+    def run(day):
+        return sync_date(day, mode=mode, limits=limits, offline=offline, normalize_pool=normalize_pool,
+                         warm_cache=False)
+    
+    started = time.monotonic()
+    try:
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sync') as pool:
+                results = list(pool.map(run, days))
+        else:
+            results = [run(day) for day in days]
+    finally:
+        if normalize_pool:
+            normalize_pool.shutdown()
+    elapsed = max(time.monotonic() - started, 1e-9)
+    
+    if any((r['status'] == 'success' and not r.get('not_modified')) or r.get('partial') for r in results):
+        refresh_response_cache()
     
     # Summary
     total_processed = sum(r.get('processed', 0) for r in results)
     total_added = sum(r.get('added', 0) for r in results)
     total_updated = sum(r.get('updated', 0) for r in results)
+    total_unchanged = sum(r.get('unchanged', 0) for r in results)
     successful = sum(1 for r in results if r['status'] == 'success')
+    not_modified = sum(1 for r in results if r.get('not_modified'))
     
     logger.info("=" * 60)
     logger.info("BULK SYNC SUMMARY")
     logger.info("=" * 60)
     logger.info(f"Date range: {start_date.date()} to {end_date.date()}")
-    logger.info(f"Successful syncs: {successful}/{len(results)}")
+    logger.info(f"Successful syncs: {successful}/{len(results)} ({not_modified} not modified)")
     logger.info(f"Total processed: {total_processed}")
     logger.info(f"Total added: {total_added}")
     logger.info(f"Total updated: {total_updated}")
+    logger.info(f"Total unchanged: {total_unchanged}")
+    logger.info(f"Elapsed: {elapsed:.1f}s with {workers} worker(s)")
+    logger.info(f"Throughput: {len(results) / elapsed * 60:.1f} days/min, {total_processed / elapsed:.1f} notices/s")
+    for stage in ('fetch', 'normalize', 'write'):
+        busy = sum(r.get('timings', {}).get(f'{stage}_seconds', 0) for r in results)
+        if busy:
+            logger.info(f"  {stage:<9} stage: {busy:.1f}s busy, {total_processed / busy:.1f} notices per busy second")
     logger.info("=" * 60)
     
     return results
 
 
+def completed_dates(start_date, end_date):
+    """Return the publication dates in a range that were synced successfully."""
+    db = SessionLocal()
+    try:
+        return set(db.scalars(
+            select(SyncState.publication_date).where(
+                SyncState.publication_date.between(start_date.date(), end_date.date()),
+                SyncState.status == 'success'
+            )
+        ))
+    finally:
+        db.close()
+
+
+def find_sync_gaps(start_date, end_date):
+    """Find days in a range that have not been synced successfully.
+    
+    Args:
+        start_date: datetime object for start date
+        end_date: datetime object for end date
+    
+    Returns:
+        list: (datetime, status) tuples, where status is the recorded
+        SyncState status ('missing', 'failed', 'in_progress') or None if the
+        day was never synced
+    """
+    db = SessionLocal()
+    try:
+        states = dict(db.execute(
+            select(SyncState.publication_date, SyncState.status).where(
+                SyncState.publication_date.between(start_date.date(), end_date.date())
+            )
+        ).all())
+    finally:
+        db.close()
+    
+    gaps = []
+    current_date = start_date
+    while current_date <= end_date:
+        status = states.get(current_date.date())
+        if status != 'success':
+            gaps.append((current_date, status))
+        current_date += timedelta(days=1)
+    return gaps
+
+
+def cached_days(start_date=None, end_date=None):
+    """Return the days held in the payload cache, optionally within a range."""
+    if payload_cache is None:
+        return []
+    days = [datetime.strptime(key.split('/')[-1], '%d-%m-%Y') for key in payload_cache.keys()]
+    return [
+        day for day in sorted(days)
+        if (start_date is None or day >= start_date) and (end_date is None or day <= end_date)
+    ]
+
+
 def run_scheduler():
     """Run the automated scheduler that syncs data daily at 2 AM."""
     logger.info("Starting automated sync scheduler")
@@ -81,43 +237,139 @@ def run_scheduler():
         time.sleep(60)  # Check every minute
 
 
-if __name__ == '__main__':
-    import sys
+def _add_backfill_options(parser):
+    """Add concurrency options shared by the backfill and range commands."""
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of days synced concurrently (default: 1)')
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help='Maximum API requests per second, 0 disables the limit (default: 1)')
+    parser.add_argument('--fetch-concurrency', type=int, default=None,
+                        help='Maximum simultaneous HTTP fetches (default: workers)')
+    parser.add_argument('--db-concurrency', type=int, default=None,
+                        help='Maximum simultaneous database writers (default: workers, at most pool size)')
+    parser.add_argument('--mode', choices=('bulk', 'stream', 'row'), default='bulk',
+                        help='Ingest mode: bulk upserts, stream (bounded memory) or per-row ORM (default: bulk)')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-sync days that were already synced successfully')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='Pipelined import: normalize in N processes, write with a single writer')
+
+
+def _backfill_kwargs(args):
+    return {
+        'workers': max(1, args.workers),
+        'rate': args.rate,
+        'fetch_concurrency': args.fetch_concurrency,
+        'db_concurrency': args.db_concurrency,
+        'mode': args.mode,
+        'force': args.force,
+        'processes': max(0, args.processes),
+    }
+
+
+def main(argv=None):
+    """Command-line entry point shared by sync.py and ``python -m utils.scheduler``."""
+    parser = argparse.ArgumentParser(description='Latvia procurement data sync')
+    commands = parser.add_subparsers(dest='command')
+    
+    commands.add_parser('once', help='Run sync once and exit')
+    
+    backfill = commands.add_parser('backfill', help='Backfill last N days (default: 7)')
+    backfill.add_argument('days', type=int, nargs='?', default=7)
+    _add_backfill_options(backfill)
+    
+    date_range = commands.add_parser('range', help='Sync date range (format: YYYY-MM-DD)')
+    date_range.add_argument('start', type=lambda v: datetime.strptime(v, '%Y-%m-%d'))
+    date_range.add_argument('end', type=lambda v: datetime.strptime(v, '%Y-%m-%d'))
+    _add_backfill_options(date_range)
+    
+    replay = commands.add_parser('replay', help='Re-ingest cached payloads without network access')
+    replay.add_argument('start', type=lambda v: datetime.strptime(v, '%Y-%m-%d'), nargs='?')
+    replay.add_argument('end', type=lambda v: datetime.strptime(v, '%Y-%m-%d'), nargs='?')
+    _add_backfill_options(replay)
+    
+    gaps = commands.add_parser('gaps', help='List (and optionally re-sync) days missing or failed in a range')
+    gaps.add_argument('start', type=lambda v: datetime.strptime(v, '%Y-%m-%d'))
+    gaps.add_argument('end', type=lambda v: datetime.strptime(v, '%Y-%m-%d'), nargs='?',
+                      default=datetime.now() - timedelta(days=1))
+    gaps.add_argument('--sync', action='store_true', help='Re-sync the listed days')
+    _add_backfill_options(gaps)
+    
+    load_dir = commands.add_parser('load-dir', help='Bulk load a directory or tarball of daily JSON files (PostgreSQL COPY)')
+    load_dir.add_argument('path')
+    
+    commands.add_parser('rebuild-rollups', help='Recompute the analytics rollup table from all notices')
+    
+    commands.add_parser('partitions', help='List the monthly partitions of the notices table')
     
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
+    detach = commands.add_parser('detach-partition', help='Detach one month of notices into a standalone table')
+    detach.add_argument('month', type=lambda v: datetime.strptime(v, '%Y-%m'))
+    
+    commands.add_parser('scheduler', help='Run continuous scheduler (daily at 2 AM)')
+    
+    args = parser.parse_args(argv)
+    if getattr(args, 'rate', 0) < 0:
+        parser.error("--rate must be 0 (no limit) or a positive number of requests per second")
+    
+    # Sync may run before the web app ever started: create tables, apply migrations
+    init_db()
+    
+    if args.command == 'backfill':
+        # Backfill data for the last N days
+        end_date = datetime.now() - timedelta(days=1)
+        start_date = end_date - timedelta(days=args.days - 1)
+        sync_date_range(start_date, end_date, **_backfill_kwargs(args))
+        
+    elif args.command == 'range':
+        # Sync specific date range: python -m utils.scheduler range 2025-11-01 2025-11-15
+        sync_date_range(args.start, args.end, **_backfill_kwargs(args))
+        
+    elif args.command == 'replay':
+        # Offline re-ingest: python -m utils.scheduler replay [2025-01-01 2025-12-31]
+        sync_dates(cached_days(args.start, args.end), offline=True, **dict(_backfill_kwargs(args), force=True))
+        
+    elif args.command == 'gaps':
+        # Missing/failed days: python -m utils.scheduler gaps 2025-01-01 [2025-12-31] [--sync]
+        gap_days = find_sync_gaps(args.start, args.end)
+        for day, status in gap_days:
+            print(f"{day.date()}  {status or 'never synced'}")
+        print(f"{len(gap_days)} day(s) without a successful sync between {args.start.date()} and {args.end.date()}")
+        if args.sync:
+            sync_dates([day for day, _ in gap_days], **dict(_backfill_kwargs(args), force=True))
+        
+    elif args.command == 'load-dir':
+        # Offline bulk load: python -m utils.scheduler load-dir /data/iub-archive
+        from .bulk_load import load_directory
+        load_directory(args.path)
+        
+    elif args.command == 'rebuild-rollups':
+        # Repair analytics rollups: python -m utils.scheduler rebuild-rollups
+        db = SessionLocal()
+        try:
+            rebuild_rollups(db)
+            db.commit()
+        finally:
+            db.close()
+        refresh_response_cache()
+        
+    elif args.command == 'partitions':
+        # Monthly partitions: python -m utils.scheduler partitions
+        for name, bounds, rows in list_partitions(engine):
+            print(f"{name}  {bounds}  ~{max(rows, 0)} rows")
+        
+    elif args.command == 'detach-partition':
+        # Archive a month: python -m utils.scheduler detach-partition 2024-01
+        name = detach_partition(engine, args.month)
+        print(f"Detached tenders_lv.{name}")
+        
+    elif args.command == 'scheduler':
+        # Run continuous scheduler
+        run_scheduler()
         
-        if command == 'once':
-            # Run sync once and exit
-            sync_latest_data()
-            
-        elif command == 'backfill':
-            # Backfill data for the last N days
-            days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
-            end_date = datetime.now() - timedelta(days=1)
-            start_date = end_date - timedelta(days=days-1)
-            sync_date_range(start_date, end_date)
-            
-        elif command == 'range':
-            # Sync specific date range: python -m utils.scheduler range 2025-11-01 2025-11-15
-            if len(sys.argv) < 4:
-                print("Usage: python -m utils.scheduler range START_DATE END_DATE")
-                print("Example: python -m utils.scheduler range 2025-11-01 2025-11-15")
-                sys.exit(1)
-            start_date = datetime.strptime(sys.argv[2], '%Y-%m-%d')
-            end_date = datetime.strptime(sys.argv[3], '%Y-%m-%d')
-            sync_date_range(start_date, end_date)
-            
-        elif command == 'scheduler':
-            # Run continuous scheduler
-            run_scheduler()
-            
-        else:
-            print("Unknown command. Available commands:")
-            print("  once       - Run sync once and exit")
-            print("  backfill N - Backfill last N days (default: 7)")
-            print("  range START END - Sync date range (format: YYYY-MM-DD)")
-            print("  scheduler  - Run continuous scheduler (daily at 2 AM)")
     else:
         # Default: run once
         sync_latest_data()
+
+
+if __name__ == '__main__':
+    main()
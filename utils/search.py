@@ -0,0 +1,65 @@
+"""Full-text search over procurement notices.
+
+On PostgreSQL, procurement_notices.search_vector is a stored tsvector
+generated from the notice text (see migration 0004_search_vector) and
+indexed with GIN. Each field is indexed twice: with the 'simple'
+configuration, which keeps Latvian words as written (PostgreSQL has no
+Latvian stemmer) and matches inflected forms through prefix queries, and
+with 'english', which stems English text. Weights rank name matches over
+the contracting authority and CPV code, and those over the description.
+
+Other databases (SQLite in benchmarks) fall back to ILIKE matching.
+"""
+import re
+from sqlalchemy import func, literal_column, or_
+from .database import ProcurementNotice
+
+# Text search configurations every field is indexed with
+SEARCH_CONFIGS = ('simple', 'english')
+
+# Longest search string accepted, in terms
+MAX_SEARCH_TERMS = 8
+
+search_vector = literal_column('tenders_lv.procurement_notices.search_vector')
+
+
+def search_terms(search):
+    """Split user input into search terms, dropping tsquery syntax."""
+    return re.findall(r'[^\W_]+', search.lower())[:MAX_SEARCH_TERMS]
+
+
+def search_tsquery(terms):
+    """Build a tsquery matching every term as a prefix, in any configuration."""
+    query_text = ' & '.join(f"{term}:*" for term in terms)
+    queries = [func.to_tsquery(config, query_text) for config in SEARCH_CONFIGS]
+    return queries[0].op('||')(queries[1])
+
+
+def apply_search(query, search, dialect):
+    """Filter a ProcurementNotice query by a search string.
+
+    Args:
+        query: SQLAlchemy select() (or Query) over ProcurementNotice
+        search: User input
+        dialect: Name of the database dialect
+
+    Returns:
+        tuple: (filtered query, rank expression or None when ranking is
+        not available)
+    """
+    terms = search_terms(search)
+    if not terms:
+        return query, None
+
+    if dialect == 'postgresql':
+        tsquery = search_tsquery(terms)
+        return query.filter(search_vector.op('@@')(tsquery)), func.ts_rank_cd(search_vector, tsquery)
+
+    for term in terms:
+        query = query.filter(or_(
+            ProcurementNotice.name.ilike(f'%{term}%'),
+            ProcurementNotice.organization_name.ilike(f'%{term}%'),
+            ProcurementNotice.cpv_type.ilike(f'%{term}%'),
+            ProcurementNotice.description.ilike(f'%{term}%')
+        ))
+    return query, None
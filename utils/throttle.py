@@ -0,0 +1,74 @@
+"""Rate and concurrency limits for sync jobs.
+
+Backfills run many sync_date calls in parallel. SyncLimits keeps them polite
+toward open.iub.gov.lv (token bucket) and bounds how many HTTP fetches and
+database writes are in flight at once, independently of the worker count.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiter.
+    
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size
+    """
+    
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=1):
+        """Block until the requested number of tokens is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SyncLimits:
+    """Limits shared by all workers of a backfill.
+    
+    Args:
+        rate: Maximum HTTP requests per second toward the open data API
+            (None disables rate limiting)
+        burst: Token bucket capacity
+        fetch_concurrency: Maximum simultaneous HTTP fetches
+        db_concurrency: Maximum simultaneous database write phases
+    """
+    
+    def __init__(self, rate=1.0, burst=1, fetch_concurrency=4, db_concurrency=4):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self._fetch_slots = threading.BoundedSemaphore(max(1, fetch_concurrency))
+        self._db_slots = threading.BoundedSemaphore(max(1, db_concurrency))
+    
+    def throttle(self):
+        """Wait for a rate limit token; called before every HTTP attempt."""
+        if self.bucket:
+            self.bucket.acquire()
+    
+    @contextmanager
+    def fetching(self):
+        """Hold a fetch slot until a response body has been read."""
+        with self._fetch_slots:
+            yield
+    
+    @contextmanager
+    def writing(self):
+        """Hold a database write slot."""
+        with self._db_slots:
+            yield